@@ -45,7 +45,7 @@ def draw_line(p_list, algorithm):
                     x0, y0, x1, y1 = x1, y1, x0, y0
                 xi = x0
                 for y in range(y0, y1 + 1):
-                    result.append([xi, round(y)])
+                    result.append([round(xi), y])
                     xi += 1 / k
     elif algorithm == 'Bresenham':
         if x0 == x1:
@@ -138,14 +138,100 @@ def draw_ellipse(p_list):
     return result
 
 
-def draw_curve(p_list, algorithm):
+def split_bezier(p_list):
+    """用de Casteljau算法在u=1/2处把Bezier曲线分为两段
+    :param p_list: (list of list of float: [[x0, y0], [x1, y1], ...]) 曲线的控制点坐标列表
+    :return: (tuple of list: (left, right)) 前后两段曲线各自的控制点坐标列表
+    """
+    left, right = [p_list[0]], [p_list[-1]]
+    while len(p_list) > 1:
+        p_list = [[(p[0] + q[0]) / 2, (p[1] + q[1]) / 2] for p, q in zip(p_list, p_list[1:])]
+        left.append(p_list[0])
+        right.append(p_list[-1])
+    return left, right[::-1]
+
+
+def is_flat(p_list, tolerance):
+    """判断Bezier曲线是否足够平直：所有内部控制点到首末控制点连线段的距离都不超过tolerance
+    （曲线位于控制点的凸包内，因此曲线与该线段的距离也不超过tolerance）
+    """
+    x0, y0 = p_list[0]
+    x1, y1 = p_list[-1]
+    dx, dy = x1 - x0, y1 - y0
+    length2 = dx * dx + dy * dy
+    for x, y in p_list[1:-1]:
+        t = 0 if length2 == 0 else min(max(((x - x0) * dx + (y - y0) * dy) / length2, 0), 1)
+        ex, ey = x0 + t * dx - x, y0 + t * dy - y
+        if ex * ex + ey * ey > tolerance * tolerance:
+            return False
+    return True
+
+
+def draw_bezier_adaptive(p_list, tolerance=0.5, max_depth=20):
+    """自适应细分绘制Bezier曲线：不断对半细分，直到每段都平直到tolerance以内，再用Bresenham算法绘制各段的弦
+    相邻两段共用端点，因此结果没有空隙，计算量与曲线在屏幕上的长度成正比
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 曲线的控制点坐标列表
+    :param tolerance: (float) 允许的最大偏差（像素）
+    :param max_depth: (int) 最大细分深度
+    :return: (list of list of int: [[x_0, y_0], [x_1, y_1], [x_2, y_2], ...]) 绘制结果的像素点坐标列表
+    """
+    res = []
+    stack = [(p_list, 0)]
+    while stack:
+        points, depth = stack.pop()
+        if depth < max_depth and not is_flat(points, tolerance):
+            left, right = split_bezier(points)
+            stack.append((right, depth + 1))
+            stack.append((left, depth + 1))  # 先处理前一段，保证像素按曲线方向排列
+            continue
+        start = [round(points[0][0]), round(points[0][1])]
+        end = [round(points[-1][0]), round(points[-1][1])]
+        line = draw_line([start, end], 'Bresenham')
+        if line[0] != start:  # draw_line按坐标递增的顺序给出像素，这里调整为从起点到终点
+            line.reverse()
+        res += line[1:] if res else line  # 起点已作为上一段的终点加入
+    return res
+
+
+_bspline_basis_cache = {}  # 取样数 -> 基函数值
+
+
+def bspline_basis(samples):
+    """三次均匀B样条在u = 0, 1/(samples-1), ..., 1处的4个基函数值（尚未除以6），每种取样数只计算一次
+    :param samples: (int) 每段曲线的取样数
+    :return: (list of tuple of float: [(t0, t1, t2, t3), ...]) 每个参数值对应的基函数值
+    """
+    if samples not in _bspline_basis_cache:
+        basis = []
+        for v in range(samples):
+            u = v / (samples - 1)
+            basis.append((-u ** 3 + 3 * u ** 2 - 3 * u + 1, 3 * u ** 3 - 6 * u ** 2 + 4,
+                          -3 * u ** 3 + 3 * u ** 2 + 3 * u + 1, u ** 3))
+        _bspline_basis_cache[samples] = basis
+    return _bspline_basis_cache[samples]
+
+
+def bspline_samples(p_list):
+    """按一段三次B样条曲线4个控制点组成的控制多边形的长度决定取样数
+    曲线对u的导数不超过控制多边形的长度，因此相邻取样点相距不超过1个像素；取样数取为2的幂加1，以便复用基函数值
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], [x3, y3]]) 这段曲线的控制点坐标列表
+    :return: (int) 取样数
+    """
+    length = sum(math.hypot(q[0] - p[0], q[1] - p[1]) for p, q in zip(p_list, p_list[1:]))
+    return 2 ** math.ceil(math.log2(max(length, 1))) + 1
+
+
+def draw_curve(p_list, algorithm, adaptive=False):
     """绘制曲线
     :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 曲线的控制点坐标列表
     :param algorithm: (string) 绘制使用的算法，包括'Bezier'和'B-spline'（三次均匀B样条曲线，曲线不必经过首末控制点）
+    :param adaptive: (bool) 是否按曲线长度自适应地决定计算量，为False时每段曲线固定取1001个参数值
     :return: (list of list of int: [[x_0, y_0], [x_1, y_1], [x_2, y_2], ...]) 绘制结果的像素点坐标列表
     """
     res = []
-    if algorithm == 'Bezier':
+    if algorithm == 'Bezier' and adaptive:
+        return draw_bezier_adaptive(p_list)
+    elif algorithm == 'Bezier':
         n = len(p_list) - 1
         loc = [[[0, 0]] * (n + 1)] * (n + 1)  # 阶数r从0~n共(n+1)阶，每一阶的点数为(n+1-r)
         loc[0] = p_list  # 初始化0阶点为控制点
@@ -158,23 +244,14 @@ def draw_curve(p_list, algorithm):
             res.append([round(loc[n][0][0]), round(loc[n][0][1])])
         return res
     elif algorithm == 'B-spline':
-        def curve_point(i, u):  # 第i条曲线上参数为u的点坐标
-            t = []
-            point = [0, 0]
-            t += [-u ** 3 + 3 * u ** 2 - 3 * u + 1, 3 * u ** 3 - 6 * u ** 2 + 4,
-                  -3 * u ** 3 + 3 * u ** 2 + 3 * u + 1, u ** 3]
-            for j in range(4):  # 每条曲线涉及4个控制点
-                point[0] += t[j] * p_list[i + j][0]
-                point[1] += t[j] * p_list[i + j][1]
-            point[0], point[1] = point[0] / 6, point[1] / 6
-            return point
-
         n = len(p_list) - 1  # 控制点从0开始编号
         for i in range(n - 2):  # k=4为阶数，一共n+1-(k-1)=n-2条三次曲线
-            for v in range(1001):
-                u = v / 1000  # 每条曲线上u从(0, 1)
-                p = curve_point(i, u)
-                res.append([round(p[0]), round(p[1])])
+            points = p_list[i:i + 4]  # 每条曲线涉及4个控制点
+            (x0, y0), (x1, y1), (x2, y2), (x3, y3) = points
+            samples = bspline_samples(points) if adaptive else 1001
+            for t0, t1, t2, t3 in bspline_basis(samples):  # 基函数矩阵与控制点矩阵相乘
+                res.append([round((t0 * x0 + t1 * x1 + t2 * x2 + t3 * x3) / 6),
+                            round((t0 * y0 + t1 * y1 + t2 * y2 + t3 * y3) / 6)])
     return res
 
 
@@ -298,173 +375,266 @@ def clip(p_list, x_min, y_min, x_max, y_max, algorithm):
                 [round(x1 + u2 * (x2 - x1)), round(y1 + u2 * (y2 - y1))]]
 
 
-class Node:
-    def __init__(self, x=0, dx=0.0, y_max=0, nxt=None):
-        self.x = x
-        self.dx = dx
-        self.y_max = y_max
-        self.next = nxt
-
-    def set_next(self, nxt):
-        self.next = nxt
-
-
-def create_net(y_max, y_min, p_list, n):
-    NET = []
-    for i in range(0, y_max + 1):
-        node = Node()
-        NET.append(node)
-    for i in range(y_min, y_max + 1):  # 从下到上创建NET
-        for j in range(0, n):
-            if p_list[j][1] == i:  # 遇到一个顶点将其作为边中的较低点
-                x0, y0 = p_list[j]
-                x1, y1 = p_list[(j - 1 + n) % n]  # 左右两条边
-                if y1 > y0:
-                    node = Node(x0, float((x1 - x0) / (y1 - y0)), y1, NET[i].next)
-                    NET[i].set_next(node)
-                x1, y1 = p_list[(j + 1 + n) % n]
-                if y1 > y0:
-                    node = Node(x0, float((x1 - x0) / (y1 - y0)), y1, NET[i].next)
-                    NET[i].set_next(node)
-    return NET
-
-
-def fill_polygon(p_list):
+def fill_spans(p_list):
+    """扫描线填充多边形，结果以水平区段表示
+    边按较低端点所在的扫描线分桶（一次遍历顶点即可建立），活性边表用列表保存，每条扫描线按交点横坐标排序后两两配对填充
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 多边形的顶点坐标列表
+    :return: (list of tuple of int: [(y, x_start, x_end), ...]) 填充结果的水平区段列表，每个区段覆盖第y行x_start到x_end（含）的像素
+    """
     result = []
-    y_max, y_min = -9999, 9999
-    for x, y in p_list:
-        if y > y_max:
-            y_max = y
-        if y < y_min:
-            y_min = y
-
-    AET = Node()
-
-    n = len(p_list)
-    NET = create_net(y_max, y_min, p_list, n)  # 创建NET
-
-    for i in range(y_min, y_max + 1):  # 从下到上处理扫描线
-        node1 = NET[i].next
-        node2 = AET
-        while node1 is not None:  # 将NET对应边插入AET中,并在插入时对x进行排序
-            while node2.next is not None and node1.x >= node2.next.x:
-                node2 = node2.next
-            temp = node1.next
-            node1.set_next(node2.next)
-            node2.set_next(node1)
-            node1 = temp
-            node2 = AET
-
-        node1 = AET  # 删除y_max == y_k的边否则保留
-        node2 = node1.next
-        while node2 is not None:
-            if node2.y_max == i:
-                node1.set_next(node2.next)
-                node2 = node1.next
-            else:
-                node1 = node1.next
-                node2 = node2.next
-
-        node = AET.next
-
-        while node is not None:  # 计算AET中扫描线和边交点的横坐标x = x + 1/m
-            node.x = node.x + node.dx
-            node = node.next
-
-        node1 = AET  # 对AET表按照x重新排序
-        node2 = AET.next
-        node1.set_next(None)
-        while node2 is not None:
-            while node1.next is not None and node2.x >= node1.next.x:
-                node1 = node1.next
-            temp = node2.next
-            node2.set_next(node1.next)
-            node1.set_next(node2)
-            node2 = temp
-            node1 = AET
-
-        node = AET.next
-        while node is not None and node.next is not None:
-            x = int(node.x)
-            while x <= node.next.x:
-                result.append([x, i])
-                x = x + 1
-            node = node.next.next  # 将一对点之间的像素点加入到结果中
-
+    edges = {}  # 边表：扫描线y -> 从y开始的边[x, 1/m, y_max]
+    for (x0, y0), (x1, y1) in zip(p_list[-1:] + p_list[:-1], p_list):
+        if y0 == y1:  # 水平边不与扫描线求交
+            continue
+        if y0 > y1:  # 以较低点作为边的起点
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        edges.setdefault(y0, []).append([x0, (x1 - x0) / (y1 - y0), y1])
+
+    starts = sorted(edges)
+    if starts:  # 交点的浮点误差可能使区段越出多边形，区段截取到多边形的横向范围内
+        x_min, x_max = min(x for x, y in p_list), max(x for x, y in p_list)
+    active = []  # 活性边表
+    k = 0
+    y = starts[0] if starts else 0
+    while k < len(starts) or active:
+        if not active and y < starts[k]:  # 跳过没有边的扫描线
+            y = starts[k]
+        if k < len(starts) and starts[k] == y:  # 将从该扫描线开始的边加入活性边表
+            active += edges[y]
+            k += 1
+        active = [e for e in active if e[2] != y]  # 删除y_max == y的边
+        for e in active:  # 计算扫描线和边交点的横坐标x = x + 1/m
+            e[0] += e[1]
+        active.sort(key=lambda e: e[0])
+        for i in range(0, len(active) - 1, 2):  # 将一对交点之间的区段加入到结果中
+            x0, x1 = max(math.floor(active[i][0]), x_min), min(math.floor(active[i + 1][0]), x_max)
+            if x0 <= x1:
+                result.append((y, x0, x1))
+        y += 1
     return result
 
 
-def is_inside(p1, p2, q):
-    """
-    判断点q是否在线段p1p2的内侧
-    """
-    R = (p2[0] - p1[0]) * (q[1] - p1[1]) - (p2[1] - p1[1]) * (q[0] - p1[0])
-    if R <= 0:
-        return True
-    else:
-        return False
-
-
-def compute_intersection(p1, p2, p3, p4):
-    """
-    计算p1p2和p3p4两条线段的交点
+def fill_polygon(p_list):
+    """扫描线填充多边形
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 多边形的顶点坐标列表
+    :return: (list of list of int: [[x_0, y_0], [x_1, y_1], [x_2, y_2], ...]) 填充结果的像素点坐标列表
     """
-    if p2[0] - p1[0] == 0:
-        x = p1[0]
-        m2 = (p4[1] - p3[1]) / (p4[0] - p3[0])
-        b2 = p3[1] - m2 * p3[0]
-        y = m2 * x + b2
-
-    elif p4[0] - p3[0] == 0:
-        x = p3[0]
-        m1 = (p2[1] - p1[1]) / (p2[0] - p1[0])
-        b1 = p1[1] - m1 * p1[0]
-        y = m1 * x + b1
-    else:
-        m1 = (p2[1] - p1[1]) / (p2[0] - p1[0])
-        b1 = p1[1] - m1 * p1[0]
-
-        m2 = (p4[1] - p3[1]) / (p4[0] - p3[0])
-        b2 = p3[1] - m2 * p3[0]
-
-        x = (b2 - b1) / (m1 - m2)
-        y = m1 * x + b1
-
-    return [x, y]
+    return [[x, y] for y, x0, x1 in fill_spans(p_list) for x in range(x0, x1 + 1)]
 
 
 def clip_polygon(p_list, clip_list):
     """
+    Sutherland-Hodgman多边形裁剪
+    依次用每条裁剪边裁剪上一条边的结果，每个顶点在每条裁剪边处只计算一次有向面积，交点由有向面积直接插值得到；
+    只用循环，不随裁剪边数加深调用栈，很大的多边形和边数很多的裁剪窗口都可以处理
     p_list是被裁减多边形的顶点参数
-    clip_list是裁剪窗口的顶点参数
+    clip_list是裁剪窗口（凸多边形）的顶点参数
     返回裁剪后的多边形的顶点参数
     """
-    result = p_list.copy()
-
+    result = p_list
     for i in range(len(clip_list)):
-        # 一条边一条边迭代裁剪
-        next_polygon = result.copy()
+        if not result:
+            break
+        (x0, y0), (x1, y1) = clip_list[i - 1], clip_list[i]  # 裁剪窗口的一条边
+        # 各顶点相对裁剪边的有向面积，<= 0表示在窗口内侧
+        sides = [(x1 - x0) * (p[1] - y0) - (y1 - y0) * (p[0] - x0) for p in result]
+        polygon, result = result, []
+        s, ds = polygon[-1], sides[-1]  # 被裁减多边形的边se从最后一个顶点开始
+        for e, de in zip(polygon, sides):
+            if (de <= 0) != (ds <= 0):  # 边与裁剪边相交，ds和de异号所以分母不为0
+                t = ds / (ds - de)
+                result.append([s[0] + t * (e[0] - s[0]), s[1] + t * (e[1] - s[1])])
+            if de <= 0:  # 终点在窗口内
+                result.append(e)
+            s, ds = e, de
 
-        result = []
+    result = [[round(p[0]), round(p[1])] for p in result]
+    return result
 
-        # 下面两个点确定裁剪窗口的一条边
-        c_edge_start = clip_list[i - 1]
-        c_edge_end = clip_list[i]
 
-        for j in range(len(next_polygon)):
+def bounding_box(p_list):
+    """图元控制点的包围盒；线段、多边形和椭圆的像素都在其中，Bezier和B样条曲线在控制点的凸包内，也在其中
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], ...]) 图元参数
+    :return: (tuple of int: (x_min, y_min, x_max, y_max)) 包围盒，p_list为空时为None
+    """
+    if len(p_list) == 0:
+        return None
+    xs = [p[0] for p in p_list]
+    ys = [p[1] for p in p_list]
+    return min(xs), min(ys), max(xs), max(ys)
 
-            # 下面两个点确定被裁减多边形的一条边
-            s_edge_start = next_polygon[j - 1]
-            s_edge_end = next_polygon[j]
 
-            if is_inside(c_edge_start, c_edge_end, s_edge_end):
-                if not is_inside(c_edge_start, c_edge_end, s_edge_start): #终点在窗口内起点在窗口外
-                    intersection = compute_intersection(s_edge_start, s_edge_end, c_edge_start, c_edge_end)
-                    result.append(intersection)
-                result.append(s_edge_end) # 结果为交点和终点
-            elif is_inside(c_edge_start, c_edge_end, s_edge_start): # 终点在外起点在窗口内
-                intersection = compute_intersection(s_edge_start, s_edge_end, c_edge_start, c_edge_end)
-                result.append(intersection)
+class GridIndex:
+    """
+    图元包围盒的均匀网格空间索引，用于点选和区域查询
+    每个图元记在其包围盒覆盖的各个格子中；覆盖的格子超过max_cells个的大图元单独存放，查询时逐个检查
+    """
 
-    result = [[round(p[0]), round(p[1])] for p in result]
-    return result
+    def __init__(self, cell_size=64, max_cells=256):
+        """
+        :param cell_size: (int) 格子边长
+        :param max_cells: (int) 一个图元最多记在多少个格子中
+        """
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self.cells = {}  # (格子x, 格子y) -> 该格子中的图元编号集合
+        self.boxes = {}  # 图元编号 -> 包围盒
+        self.large = set()  # 大图元的编号
+
+    def cell_range(self, x_min, y_min, x_max, y_max):
+        s = self.cell_size
+        return x_min // s, y_min // s, x_max // s, y_max // s
+
+    def update(self, key, bbox):
+        """加入图元或更新图元的包围盒，bbox为None时移除该图元
+        :param key: 图元编号
+        :param bbox: (tuple of int: (x_min, y_min, x_max, y_max)) 包围盒
+        """
+        self.remove(key)
+        if bbox is None:
+            return
+        self.boxes[key] = bbox
+        cx0, cy0, cx1, cy1 = self.cell_range(*bbox)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > self.max_cells:
+            self.large.add(key)
+            return
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                self.cells.setdefault((cx, cy), set()).add(key)
+
+    def remove(self, key):
+        bbox = self.boxes.pop(key, None)
+        if bbox is None:
+            return
+        if key in self.large:
+            self.large.discard(key)
+            return
+        cx0, cy0, cx1, cy1 = self.cell_range(*bbox)
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                cell = self.cells[(cx, cy)]
+                cell.discard(key)
+                if not cell:
+                    del self.cells[(cx, cy)]
+
+    def clear(self):
+        self.cells = {}
+        self.boxes = {}
+        self.large = set()
+
+    def query_rect(self, x_min, y_min, x_max, y_max):
+        """包围盒与矩形[x_min, x_max]×[y_min, y_max]相交的图元编号集合"""
+        cx0, cy0, cx1, cy1 = self.cell_range(x_min, y_min, x_max, y_max)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(self.cells):  # 查询范围比已用的格子还多，直接遍历格子
+            candidates = set().union(*(keys for (cx, cy), keys in self.cells.items()
+                                       if cx0 <= cx <= cx1 and cy0 <= cy <= cy1))
+        else:
+            candidates = set()
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    keys = self.cells.get((cx, cy))
+                    if keys:
+                        candidates |= keys
+        candidates |= self.large
+        result = set()
+        for key in candidates:
+            bx0, by0, bx1, by1 = self.boxes[key]
+            if bx0 <= x_max and x_min <= bx1 and by0 <= y_max and y_min <= by1:
+                result.add(key)
+        return result
+
+    def query_point(self, x, y, tolerance=0):
+        """包围盒（向外扩展tolerance）包含点(x, y)的图元编号集合"""
+        return self.query_rect(x - tolerance, y - tolerance, x + tolerance, y + tolerance)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def __contains__(self, key):
+        return key in self.boxes
+
+
+class RasterCache:
+    """
+    图元绘制结果的缓存，键为(图元类型, 几何参数, 算法)，超出容量时淘汰最近最少使用的结果
+    translate为True时，Bresenham线段、多边形和椭圆的几何参数以包围盒左上角为原点记录，只相差一个平移的图元共用一份结果，
+    取出时再加上平移量，这几种算法的结果与直接计算完全相同（椭圆中心的取整向零截断，只在坐标不为负时成立）；
+    DDA、Naive、曲线和填充使用浮点运算，平移后取整的结果经常不同，所以仍按绝对坐标记录
+    """
+
+    def __init__(self, max_pixels=1 << 21, translate=True, adaptive=False):
+        """
+        :param max_pixels: (int) 缓存中最多保存的像素点（填充多边形为水平区段）总数
+        :param translate: (bool) 是否让只相差平移的图元共用绘制结果
+        :param adaptive: (bool) 绘制曲线时是否使用自适应算法，见draw_curve
+        """
+        self.max_pixels = max_pixels
+        self.translate = translate
+        self.adaptive = adaptive
+        self.entries = {}  # 键 -> 绘制结果，按最近使用的先后排列
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def exact_under_translation(item_type, algorithm, dx, dy):
+        """把包围盒左上角平移到(dx, dy)后，图元的绘制结果是否恰好等于原结果平移"""
+        if item_type == 'ellipse':
+            return dx >= 0 and dy >= 0
+        return (item_type == 'line' or item_type == 'polygon') and algorithm == 'Bresenham'
+
+    def rasterize(self, item_type, p_list, algorithm):
+        """实际计算图元的绘制结果"""
+        if item_type == 'line':
+            return draw_line(p_list, algorithm)
+        elif item_type == 'polygon':
+            return draw_polygon(p_list, algorithm)
+        elif item_type == 'fill_polygon':
+            return fill_spans(p_list)
+        elif item_type == 'ellipse':
+            return draw_ellipse(p_list)
+        elif item_type == 'curve':
+            return draw_curve(p_list, algorithm, self.adaptive)
+        return []
+
+    def draw(self, item_type, p_list, algorithm):
+        """
+        :param item_type: (string) 图元类型，'line'、'polygon'、'fill_polygon'、'ellipse'、'curve'
+        :param p_list: (list of list of int: [[x0, y0], [x1, y1], ...]) 图元参数
+        :param algorithm: (string) 绘制算法
+        :return: (list) 填充多边形为水平区段列表[(y, x_start, x_end), ...]，其余图元为像素点坐标列表[[x, y], ...]；
+                 结果可能与缓存共用，不要修改
+        """
+        dx, dy = 0, 0
+        if self.translate and len(p_list) > 0:  # 以包围盒左上角为原点，使相对坐标都不为负
+            dx, dy = min(p[0] for p in p_list), min(p[1] for p in p_list)
+            if not self.exact_under_translation(item_type, algorithm, dx, dy):
+                dx, dy = 0, 0
+        key = (item_type, tuple((x - dx, y - dy) for x, y in p_list), algorithm)
+        result = self.entries.pop(key, None)
+        if result is None:
+            self.misses += 1
+            result = self.rasterize(item_type, [list(p) for p in key[1]], algorithm)
+            self.size += len(result)
+        else:
+            self.hits += 1
+        self.entries[key] = result  # 放到最近使用的位置
+        while self.size > self.max_pixels and self.entries:  # 淘汰最近最少使用的结果
+            old = next(iter(self.entries))
+            self.size -= len(self.entries.pop(old))
+            self.evictions += 1
+        if dx == 0 and dy == 0:
+            return result
+        if item_type == 'fill_polygon':
+            return [(y + dy, x0 + dx, x1 + dx) for y, x0, x1 in result]
+        return [[x + dx, y + dy] for x, y in result]
+
+    def cache_info(self):
+        """命中、未命中、淘汰次数以及当前缓存的结果数和像素点数"""
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': len(self.entries), 'size': self.size, 'max_pixels': self.max_pixels}
+
+    def clear(self):
+        self.entries = {}
+        self.size = 0
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cg_cli
+
+
+def collect_tasks(sources, output_root):
+    """把输入来源展开为(指令文件, 图像保存目录)列表
+
+    :param sources: (list of str) 输入来源，可以是指令文件、目录（其中所有.txt文本指令文件和.cgs二进制指令文件）、通配符模式，或以@开头的清单文件
+        清单文件每行一个指令文件路径，后面可以跟一个图像保存目录，相对路径相对于清单文件所在目录
+    :param output_root: (str) 未在清单中指定保存目录的指令文件，图像保存到output_root下与文件同名（去掉扩展名）的目录
+    :return: (list of tuple: [(str, str), ...]) 按来源顺序排列的任务列表
+    """
+    tasks = []
+    for source in sources:
+        if source.startswith('@'):
+            manifest = source[1:]
+            base = os.path.dirname(manifest)
+            with open(manifest, 'r') as fp:
+                for line in fp:
+                    line = line.split()
+                    if not line or line[0].startswith('#'):
+                        continue
+                    input_file = os.path.join(base, line[0])
+                    output_dir = os.path.join(base, line[1]) if len(line) > 1 else None
+                    tasks.append((input_file, output_dir))
+        elif os.path.isdir(source):
+            paths = glob.glob(os.path.join(source, '*.txt')) + glob.glob(os.path.join(source, '*.cgs'))
+            tasks.extend((path, None) for path in sorted(paths))
+        elif glob.has_magic(source):
+            tasks.extend((path, None) for path in sorted(glob.glob(source)))
+        else:
+            tasks.append((source, None))
+    tasks = [(input_file, output_dir if output_dir is not None else
+              os.path.join(output_root, os.path.splitext(os.path.basename(input_file))[0]))
+             for input_file, output_dir in tasks]
+    seen = {}
+    for input_file, output_dir in tasks:
+        key = os.path.normpath(output_dir)
+        if key in seen and seen[key] != input_file:
+            raise ValueError(f'{seen[key]} and {input_file} would both save to {output_dir}')
+        seen[key] = input_file
+    return tasks
+
+
+def render_file(task):
+    """在当前进程中执行一个指令文件，返回该文件的执行报告，异常不会向外抛出"""
+    input_file, output_dir = task
+    report = {'input': input_file, 'output': output_dir, 'ok': True, 'error': None, 'instructions': 0, 'saves': 0}
+    start = time.perf_counter()
+    try:
+        ops = cg_cli.compile_file(input_file)
+        report['instructions'] = len(ops)
+        report['saves'] = sum(1 for name, args in ops if name == 'save_canvas')
+        os.makedirs(output_dir, exist_ok=True)
+        cg_cli.Interpreter(output_dir).execute(ops)
+    except Exception as e:
+        report['ok'] = False
+        report['error'] = f'{type(e).__name__}: {e}'
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def run_batch(tasks, jobs=None):
+    """用进程池执行所有任务，每个工作进程只导入一次numpy和Pillow
+
+    :param tasks: (list of tuple: [(str, str), ...]) collect_tasks得到的任务列表
+    :param jobs: (int) 工作进程数，默认为CPU核数；为1时在当前进程中依次执行
+    :return: (list of dict) 与tasks顺序一致的执行报告
+    """
+    if jobs == 1 or len(tasks) <= 1:
+        return [render_file(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(render_file, tasks))
+
+
+def format_report(reports, seconds):
+    lines = []
+    for report in reports:
+        status = 'ok' if report['ok'] else 'FAILED'
+        lines.append(f"{status:6} {report['seconds']:8.3f}s  {report['input']} -> {report['output']}")
+        if not report['ok']:
+            lines.append(f"       {report['error']}")
+    failed = sum(1 for report in reports if not report['ok'])
+    lines.append(f'{len(reports)} files, {len(reports) - failed} ok, {failed} failed, {seconds:.3f}s')
+    return '\n'.join(lines)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='批量执行指令文件')
+    parser.add_argument('sources', nargs='+', help='指令文件、目录、通配符模式或@清单文件')
+    parser.add_argument('-o', '--output', default='output', help='图像保存的根目录')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='工作进程数，默认为CPU核数')
+    parser.add_argument('--report', help='将执行报告以JSON格式写入该文件')
+    args = parser.parse_args(argv[1:])
+
+    tasks = collect_tasks(args.sources, args.output)
+    start = time.perf_counter()
+    reports = run_batch(tasks, args.jobs)
+    seconds = time.perf_counter() - start
+    print(format_report(reports, seconds))
+    if args.report:
+        with open(args.report, 'w') as fp:
+            json.dump({'seconds': seconds, 'files': reports}, fp, indent=2)
+    return 0 if all(report['ok'] for report in reports) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import cg_algorithms as alg
+
+
+def random_points(rng, n, size):
+    """n个坐标在[0, size)内的随机点"""
+    return [[rng.randrange(size), rng.randrange(size)] for _ in range(n)]
+
+
+def star_polygon(rng, n, size):
+    """n个顶点的简单多边形：顶点按角度排列、半径随机，边数多时仍有大量交点需要排序"""
+    c = size / 2
+    points = []
+    for i in range(n):
+        a = 2 * math.pi * i / n
+        r = c * rng.uniform(0.3, 0.95)
+        points.append([int(c + r * math.cos(a)), int(c + r * math.sin(a))])
+    return points
+
+
+def generate_scene(rng, items, width=600, height=600, save_every=50, reset_every=0):
+    """生成随机的指令文件内容，包含所有指令类型
+
+    :param rng: (random.Random) 随机数生成器
+    :param items: (int) 绘制和编辑指令的条数
+    :param width: (int) 画布宽度
+    :param height: (int) 画布高度
+    :param save_every: (int) 每隔多少条指令保存一次画布
+    :param reset_every: (int) 每隔多少条指令重置一次画布，0表示不重置
+    :return: (list of str) 指令文件的各行
+    """
+    def pt():
+        return [rng.randrange(width // 4, width * 3 // 4), rng.randrange(height // 4, height * 3 // 4)]
+
+    def inside(p_list):  # 编辑后图元仍在画布以内，曲线在控制点的凸包内，所以只检查控制点
+        return all(0 <= x < width and 0 <= y < height for x, y in p_list)
+
+    lines = ['resetCanvas %d %d' % (width, height)]
+    shapes = {}  # 图元编号 -> [类型, 参数]，用于生成合法的编辑指令
+    for i in range(items):
+        r = rng.random()
+        if r < 0.05:
+            lines.append('setColor %d %d %d' % (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+        elif r < 0.25:
+            p_list = [pt(), pt()]
+            lines.append('drawLine l%d %d %d %d %d %s' % (i, *p_list[0], *p_list[1], rng.choice(['DDA', 'Bresenham'])))
+            shapes['l%d' % i] = ['line', p_list]
+        elif r < 0.4:
+            p_list = random_points(rng, rng.randint(3, 8), min(width, height))
+            lines.append('drawPolygon p%d %s %s' % (i, ' '.join(map(str, sum(p_list, []))), rng.choice(['DDA', 'Bresenham'])))
+            shapes['p%d' % i] = ['polygon', p_list]
+        elif r < 0.45:
+            p_list = star_polygon(rng, rng.randint(3, 12), min(width, height))
+            lines.append('fillPolygon f%d %s' % (i, ' '.join(map(str, sum(p_list, [])))))
+            shapes['f%d' % i] = ['fill_polygon', p_list]
+        elif r < 0.55:
+            p_list = [pt(), pt()]
+            lines.append('drawEllipse e%d %d %d %d %d' % (i, *p_list[0], *p_list[1]))
+            shapes['e%d' % i] = ['ellipse', p_list]
+        elif r < 0.65:
+            p_list = [pt() for _ in range(rng.randint(4, 7))]
+            lines.append('drawCurve c%d %s %s' % (i, ' '.join(map(str, sum(p_list, []))), rng.choice(['Bezier', 'B-spline'])))
+            shapes['c%d' % i] = ['curve', p_list]
+        elif r < 0.75 and shapes:
+            item_id = rng.choice(list(shapes))
+            dx, dy = rng.randint(-20, 20), rng.randint(-20, 20)
+            result = alg.translate(shapes[item_id][1], dx, dy)
+            if inside(result):
+                lines.append('translate %s %d %d' % (item_id, dx, dy))
+                shapes[item_id][1] = result
+        elif r < 0.8 and shapes:
+            item_id = rng.choice(list(shapes))
+            if shapes[item_id][0] != 'ellipse':
+                angle = rng.randint(-30, 30)
+                result = alg.rotate(shapes[item_id][1], width // 2, height // 2, angle)
+                if inside(result):
+                    lines.append('rotate %s %d %d %d' % (item_id, width // 2, height // 2, angle))
+                    shapes[item_id][1] = result
+        elif r < 0.85 and shapes:
+            item_id = rng.choice(list(shapes))
+            s = '%.2f' % rng.uniform(0.7, 1.1)
+            result = alg.scale(shapes[item_id][1], width // 2, height // 2, float(s))
+            if inside(result):
+                lines.append('scale %s %d %d %s' % (item_id, width // 2, height // 2, s))
+                shapes[item_id][1] = result
+        elif r < 0.9:
+            line_ids = [item_id for item_id in shapes if shapes[item_id][0] == 'line']
+            if line_ids:
+                item_id = rng.choice(line_ids)
+                x_min, y_min, x_max, y_max = width // 4, height // 4, width * 3 // 4, height * 3 // 4
+                algorithm = rng.choice(['Cohen-Sutherland', 'Liang-Barsky'])
+                result = alg.clip(shapes[item_id][1], x_min, y_min, x_max, y_max, algorithm)
+                if result:  # 完全被裁掉的线段无法再绘制
+                    lines.append('clip %s %d %d %d %d %s' % (item_id, x_min, y_min, x_max, y_max, algorithm))
+                    shapes[item_id][1] = result
+        if save_every and i % save_every == save_every - 1:
+            lines.append('saveCanvas s%d' % i)
+        if reset_every and i % reset_every == reset_every - 1:
+            lines.append('resetCanvas %d %d' % (width, height))
+            shapes = {}
+    lines.append('saveCanvas final')
+    return lines
+
+
+def algorithm_cases(rng, quick=False):
+    """核心算法模块各入口的测试用例：(名称, 参数, 无参数的调用函数)"""
+    sizes = [10, 100] if quick else [10, 100, 1000]
+    cases = []
+    for algorithm in ['Naive', 'DDA', 'Bresenham']:
+        for n in sizes:
+            p_list = [[0, 0], [n, n * 2 // 3]]
+            cases.append(('draw_line', {'algorithm': algorithm, 'length': n},
+                          lambda p_list=p_list, algorithm=algorithm: alg.draw_line(p_list, algorithm)))
+    for algorithm in ['DDA', 'Bresenham']:
+        for n in ([4, 32] if quick else [4, 32, 256]):
+            p_list = star_polygon(rng, n, 500)
+            cases.append(('draw_polygon', {'algorithm': algorithm, 'vertices': n},
+                          lambda p_list=p_list, algorithm=algorithm: alg.draw_polygon(p_list, algorithm)))
+    for n in sizes:
+        p_list = [[0, 0], [n, n // 2]]
+        cases.append(('draw_ellipse', {'size': n}, lambda p_list=p_list: alg.draw_ellipse(p_list)))
+    for algorithm in ['Bezier', 'B-spline']:
+        for n in ([4, 16] if quick else [4, 16, 64]):
+            p_list = random_points(rng, n, 500)
+            cases.append(('draw_curve', {'algorithm': algorithm, 'control_points': n},
+                          lambda p_list=p_list, algorithm=algorithm: alg.draw_curve(p_list, algorithm)))
+            if algorithm == 'Bezier':
+                cases.append(('draw_curve', {'algorithm': 'Bezier-adaptive', 'control_points': n},
+                              lambda p_list=p_list: alg.draw_curve(p_list, 'Bezier', adaptive=True)))
+    for n in ([4, 64] if quick else [4, 64, 1024]):
+        p_list = star_polygon(rng, n, 500)
+        cases.append(('fill_polygon', {'vertices': n}, lambda p_list=p_list: alg.fill_polygon(p_list)))
+    segments = [random_points(rng, 2, 1000) for _ in range(1000)]
+    for algorithm in ['Cohen-Sutherland', 'Liang-Barsky']:
+        cases.append(('clip', {'algorithm': algorithm, 'segments': len(segments)},
+                      lambda algorithm=algorithm: [alg.clip(s, 250, 250, 750, 750, algorithm) for s in segments]))
+    clip_list = [[200, 200], [800, 200], [800, 800], [200, 800]]
+    for n in ([8, 128] if quick else [8, 128, 2048]):
+        p_list = star_polygon(rng, n, 1000)
+        cases.append(('clip_polygon', {'vertices': n}, lambda p_list=p_list: alg.clip_polygon(p_list, clip_list)))
+    for n in ([10, 1000] if quick else [10, 1000, 100000]):
+        p_list = random_points(rng, n, 1000)
+        cases.append(('translate', {'points': n}, lambda p_list=p_list: alg.translate(p_list, 3, -5)))
+        cases.append(('rotate', {'points': n}, lambda p_list=p_list: alg.rotate(p_list, 500, 500, 30)))
+        cases.append(('scale', {'points': n}, lambda p_list=p_list: alg.scale(p_list, 500, 500, 0.5)))
+    return cases
+
+
+def cli_cases(rng, tmp, quick=False, scales=None):
+    """命令行程序端到端的测试用例，生成的指令文件和输出的图像都在目录tmp中，scales为生成的指令条数"""
+    import cg_cli
+
+    cases = []
+    for items in scales or ([200] if quick else [200, 2000, 20000]):
+        path = os.path.join(tmp, 'scene%d.txt' % items)
+        with open(path, 'w') as fp:
+            fp.write('\n'.join(generate_scene(rng, items)) + '\n')
+        ops = cg_cli.compile_file(path)
+        cases.append(('cli_parse', {'instructions': len(ops)}, lambda path=path: cg_cli.compile_file(path)))
+        cases.append(('cli_render', {'instructions': len(ops)},
+                      lambda ops=ops: cg_cli.Interpreter(tmp).execute(ops)))
+        cases.append(('cli_process', {'instructions': len(ops)},
+                      lambda path=path: subprocess.run([sys.executable, os.path.join(os.path.dirname(__file__), 'cg_cli.py'),
+                                                        '-j', '1', path, tmp], check=True)))
+    return cases
+
+
+def measure(func, repeat=5, min_time=0.2):
+    """重复调用func，每轮至少运行min_time秒，返回各轮的单次平均耗时"""
+    start = time.perf_counter()
+    func()
+    number = max(1, int(min_time / max(time.perf_counter() - start, 1e-9)))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return number, times
+
+
+def case_key(result):
+    return result['name'] + ' ' + ' '.join(f'{k}={v}' for k, v in sorted(result['params'].items()))
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='核心算法模块和命令行程序的性能测试')
+    parser.add_argument('-o', '--output', help='把结果以JSON格式写入该文件')
+    parser.add_argument('-k', '--filter', default='', help='只运行名称包含该字符串的用例')
+    parser.add_argument('--quick', action='store_true', help='只运行较小的规模')
+    parser.add_argument('--no-cli', action='store_true', help='不运行命令行程序的端到端用例')
+    parser.add_argument('--scale', type=int, action='append', help='端到端用例的指令条数，可以多次给出')
+    parser.add_argument('--repeat', type=int, default=5, help='每个用例的重复轮数')
+    parser.add_argument('--seed', type=int, default=0, help='生成数据的随机数种子')
+    parser.add_argument('--compare', help='与之前保存的JSON结果比较')
+    args = parser.parse_args(argv[1:])
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, 'r') as fp:
+            baseline = {case_key(result): result for result in json.load(fp)['results']}
+
+    rng = random.Random(args.seed)
+    results = []
+    with tempfile.TemporaryDirectory(prefix='cg_bench_') as tmp:  # 结束后删除生成的指令文件和图像
+        cases = algorithm_cases(rng, args.quick)
+        if not args.no_cli:
+            cases += cli_cases(rng, tmp, args.quick, args.scale)
+        for name, params, func in cases:
+            result = {'name': name, 'params': params}
+            if args.filter not in case_key(result):
+                continue
+            number, times = measure(func, args.repeat)
+            result.update({'number': number, 'min': min(times), 'median': statistics.median(times)})
+            results.append(result)
+            line = f"{case_key(result):60} {result['min'] * 1e3:12.4f} ms"
+            if case_key(result) in baseline:
+                line += f"  x{baseline[case_key(result)]['min'] / result['min']:.2f}"
+            print(line, flush=True)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump({'commit': git_commit(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                       'python': platform.python_version(), 'platform': platform.platform(),
+                       'seed': args.seed, 'results': results}, fp, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
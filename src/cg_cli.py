@@ -1,158 +1,943 @@
 #!/usr/bin/env python
 # -*- coding:utf-8 -*-
 
+import argparse
+import bisect
+import hashlib
+import json
 import os
+import shutil
+import struct
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-from PIL import Image
 
 import cg_algorithms as alg
+import cg_vectorized as vec
 
-input_file = sys.argv[1]
-output_dir = sys.argv[2]
-os.makedirs(output_dir, exist_ok=True)
-item_dict = {}
-pen_color = np.zeros(3, np.uint8)
-width = 0
-height = 0
-
-
-def reset_canvas(line):
-    global width, height, item_dict
-    width = int(line[1])
-    height = int(line[2])
-    item_dict = {}
-
-
-def save_canvas(line):
-    global height, width, item_dict
-    save_name = line[1]
-    canvas = np.zeros([height, width, 3], np.uint8)
-    canvas.fill(255)
-    for item_type, p_list, algorithm, color in item_dict.values():
-        if item_type == 'line':
-            pixels = alg.draw_line(p_list, algorithm)
-            for x, y in pixels:
-                canvas[y, x] = color
-        elif item_type == 'polygon':
-            pixels = alg.draw_polygon(p_list, algorithm)
-            for x, y in pixels:
-                canvas[y, x] = color
+
+TILED_PIXELS = 4096 * 4096  # 画布像素数超过该值时改用分块的内存映射画布
+
+
+class InstructionError(Exception):
+    """指令文件中出现无法执行的指令"""
+
+
+class ImageWriteError(Exception):
+    """后台保存图像时出现的错误，在执行结束时统一报告"""
+
+
+DRAW_OPS = {'line': 'draw_line', 'polygon': 'draw_polygon', 'fill_polygon': 'fill_polygon',
+            'ellipse': 'draw_ellipse', 'curve': 'draw_curve'}  # 图元类型 -> 绘制该图元的操作
+ITEM_OPS = {'draw_line', 'draw_polygon', 'fill_polygon', 'draw_ellipse', 'draw_curve',
+            'translate', 'rotate', 'scale', 'clip'}  # 第一个参数是图元编号的操作
+
+
+class Profiler:
+    """
+    记录各部分的调用次数和耗时，分为instruction（指令类型）、algorithm（图元类型与算法的光栅化）、item（以该图元为对象的指令）和stage（解析、光栅化、写画布、编码等阶段）四类
+    不做性能分析时各处只多一次是否为None的判断
+    """
+
+    def __init__(self):
+        self.stats = {'instruction': {}, 'algorithm': {}, 'item': {}, 'stage': {}}  # 类别 -> {名称: [次数, 秒数]}
+        self.wall = None  # 整个运行的时间，由调用者填写
+        self.lock = threading.Lock()  # 编码在后台线程中进行
+
+    TITLES = {'instruction': 'instruction (per op)', 'algorithm': 'algorithm (rasterization)',
+              'item': 'item (ops on the item id)', 'stage': 'stage'}  # 摘要中各类别的标题
+
+    def add(self, category, key, seconds, count=1):
+        with self.lock:
+            entry = self.stats[category].setdefault(key, [0, 0.0])
+            entry[0] += count
+            entry[1] += seconds
+
+    def merge(self, stats):
+        """合并另一个Profiler的stats，用于汇总各工作进程的结果"""
+        for category, entries in stats.items():
+            for key, (count, seconds) in entries.items():
+                self.add(category, key, seconds, count)
+
+    def report(self):
+        report = {category: {key: {'count': count, 'seconds': seconds} for key, (count, seconds) in entries.items()}
+                  for category, entries in self.stats.items()}
+        report['wall_seconds'] = self.wall
+        return report
+
+    def summary(self, top=15):
+        """按耗时从大到小排列的文字摘要，每类最多列出top项"""
+        lines = [] if self.wall is None else [f'wall time {self.wall * 1e3:.3f} ms', '']
+        for category, entries in self.stats.items():
+            if not entries:
+                continue
+            total = sum(seconds for count, seconds in entries.values())
+            lines.append(f'{self.TITLES[category]:32} {"count":>8} {"total ms":>12} {"mean ms":>10} {"share":>7}')
+            ranked = sorted(entries.items(), key=lambda entry: entry[1][1], reverse=True)
+            for key, (count, seconds) in ranked[:top]:
+                share = seconds / total * 100 if total else 0.0
+                lines.append(f'  {str(key):30} {count:8d} {seconds * 1e3:12.3f} {seconds * 1e3 / count:10.4f} {share:6.1f}%')
+            if len(ranked) > top:
+                lines.append(f'  ... {len(ranked) - top} more')
+            lines.append('')
+        return '\n'.join(lines)
+
+
+def paint_pixels(canvas, pixels, color, mask=None):
+    """将像素点坐标一次性写入画布，pixels为[[x, y], ...]形式的列表或(N, 2)数组，给出mask时只写入mask为True的位置"""
+    pixels = np.asarray(pixels, dtype=np.int64).reshape(-1, 2)
+    xs, ys = pixels[:, 0], pixels[:, 1]
+    if mask is not None:
+        inside = mask[ys, xs]
+        xs, ys = xs[inside], ys[inside]
+    canvas[ys, xs] = color
+
+
+def paint_spans(canvas, spans, color, mask=None):
+    """将水平区段[(y, x_start, x_end), ...]逐行以切片赋值写入画布，超出画布的部分被截去，给出mask时只写入mask为True的位置"""
+    h, w = canvas.shape[:2]
+    for y, x0, x1 in spans:
+        if 0 <= y < h:
+            x0, x1 = max(x0, 0), min(x1, w - 1) + 1
+            if mask is None:
+                canvas[y, x0:x1] = color
+            else:
+                canvas[y, x0:x1][mask[y, x0:x1]] = color
+
+
+def rasterize_items(items, profiler=None):
+    """计算每个图元的像素点，线段和多边形的边按算法分组，每组只调用一次draw_lines
+
+    :param items: (list) item_dict中图元的值
+    :param profiler: (Profiler) 给出时按算法记录耗时，成组计算的线段和多边形每组记录一次，次数为组中的图元数
+    """
+    pixels = [None] * len(items)
+    groups = {}  # 算法 -> (图元下标列表, 各图元的边列表)
+    for index, (item_type, p_list, algorithm, color) in enumerate(items):
+        if profiler is not None and item_type != 'line' and item_type != 'polygon':
+            start = time.perf_counter()
+            pixels[index] = rasterize_items([items[index]])[0]
+            profiler.add('algorithm', f'{item_type}:{algorithm}' if algorithm else item_type,
+                         time.perf_counter() - start)
+        elif item_type == 'line' or item_type == 'polygon':
+            owners, segments = groups.setdefault(algorithm, ([], []))
+            owners.append(index)
+            if item_type == 'line':
+                segments.append(np.reshape(p_list, (-1, 4)))
+            else:
+                segments.append(vec.polygon_segments(p_list))
+        elif item_type == 'fill_polygon':
+            pixels[index] = alg.fill_spans(p_list)
         elif item_type == 'ellipse':
-            pixels = alg.draw_ellipse(p_list)
-            for x, y in pixels:
-                canvas[int(y), int(x)] = color
+            pixels[index] = vec.draw_ellipse(p_list)
         elif item_type == 'curve':
-            pixels = alg.draw_curve(p_list, algorithm)
-            for x, y in pixels:
-                canvas[y, x] = color
-    Image.fromarray(canvas).save(os.path.join(output_dir, save_name + '.bmp'), 'bmp')
-
-
-def set_color(line):
-    global pen_color
-    pen_color[0] = int(line[1])
-    pen_color[1] = int(line[2])
-    pen_color[2] = int(line[3])
-
-
-def draw_line(line):
-    global item_dict
-    item_id = line[1]
-    x0 = int(line[2])
-    y0 = int(line[3])
-    x1 = int(line[4])
-    y1 = int(line[5])
-    algorithm = line[6]
-    item_dict[item_id] = ['line', [[x0, y0], [x1, y1]], algorithm, np.array(pen_color)]
-
-
-
-def draw_polygon(line):
-    global item_dict
-    item_id = line[1]
-    p_list = []
-    for i in range(2, len(line) - 2, 2):
-        p_list.append([int(line[i]), int(line[i + 1])])
-    # print(f"poly p_list is {p_list}")
-    algorithm = line[-1]
-    item_dict[item_id] = ['polygon', p_list, algorithm, np.array(pen_color)]
-
-
-def draw_ellipse(line):
-    global item_dict
-    item_id = line[1]
-    p_list = [[int(line[2]), int(line[3])], [int(line[4]), int(line[5])]]
-    item_dict[item_id] = ['ellipse', p_list, None, np.array(pen_color)]
-
-
-def draw_curve(line):
-    global item_dict
-    item_id = line[1]
-    p_list = []
-    for i in range(2, len(line) - 2, 2):
-        p_list.append([int(line[i]), int(line[i + 1])])
-    algorithm = line[-1]
-    item_dict[item_id] = ['curve', p_list, algorithm, np.array(pen_color)]
-
-
-def translate(line):
-    global item_dict
-    item_id = line[1]
-    p_list = item_dict[item_id][1]  # 图元原本的参数
-    dx, dy = int(line[2]), int(line[3])
-    item_dict[item_id][1] = alg.translate(p_list, dx, dy)  # 修改成平移后的参数
-
-
-def rotate(line):
-    global item_dict
-    item_id = line[1]
-    p_list = item_dict[item_id][1]  # 图元原本的参数
-    x, y, r = int(line[2]), int(line[3]), float(line[4])
-    item_dict[item_id][1] = alg.rotate(p_list, x, y, r)  # 修改成旋转后的参数
-
-
-def scale(line):
-    global item_dict
-    item_id = line[1]
-    p_list = item_dict[item_id][1]  # 图元原本的参数
-    x, y, s = int(line[2]), int(line[3]), float(line[4])
-    item_dict[item_id][1] = alg.scale(p_list, x, y, s)  # 修改成缩放后的参数
-
-
-def clip(line):
-    global item_dict
-    item_id = line[1]
-    p_list = [item_dict[item_id][1][0], item_dict[item_id][1][1]]  # 图元原本的参数，p_list是线段的起点和终点
-    x_min, y_min, x_max, y_max, algorithm = int(line[2]), int(line[3]), int(line[4]), int(line[5]), line[6]
-    item_dict[item_id][1] = alg.clip(p_list, x_min, y_min, x_max, y_max, algorithm)  # 修改成裁剪后的参数
-
-
-func_dict = {
-    'resetCanvas': reset_canvas,
-    'saveCanvas': save_canvas,
-    'setColor': set_color,
-    'drawLine': draw_line,
-    'drawPolygon': draw_polygon,
-    'drawEllipse': draw_ellipse,
-    'drawCurve': draw_curve,
-    'translate': translate,
-    'rotate': rotate,
-    'scale': scale,
-    'clip': clip,
-}
+            pixels[index] = vec.draw_curve(p_list, algorithm)
+    for algorithm, (owners, segments) in groups.items():
+        if profiler is not None:
+            began = time.perf_counter()
+        result, offsets = vec.draw_lines(np.concatenate(segments), algorithm)
+        bounds = offsets[np.cumsum([0] + [len(s) for s in segments])]
+        for index, start, stop in zip(owners, bounds[:-1], bounds[1:]):
+            pixels[index] = result[start:stop]
+        if profiler is not None:
+            profiler.add('algorithm', f'line/polygon:{algorithm}', time.perf_counter() - began, len(owners))
+    return pixels
+
+
+def mark_raster(mask, raster):
+    """在mask中标记图元覆盖的像素"""
+    item_type, data, bbox = raster
+    if item_type == 'fill_polygon':
+        for y, x0, x1 in data:
+            mask[y, x0:x1 + 1] = True
+    else:
+        mask[data[:, 1], data[:, 0]] = True
+
+
+def parse_points(tokens):
+    """把['x0', 'y0', 'x1', 'y1', ...]解析为[[x0, y0], [x1, y1], ...]"""
+    return [[int(tokens[i]), int(tokens[i + 1])] for i in range(0, len(tokens) - 1, 2)]
+
+
+def compile_instruction(line):
+    """把一行指令编译为(操作名, 参数)，操作名是Interpreter中对应的方法名，整数已解析，图元编号已驻留
+
+    :param line: (list of str) 按空白分开的一行指令
+    :return: (tuple: (str, tuple)) 编译后的操作
+    """
+    name = line[0]
+    if name == 'resetCanvas':
+        return 'reset_canvas', (int(line[1]), int(line[2]))
+    elif name == 'saveCanvas':
+        return 'save_canvas', (line[1],)
+    elif name == 'setColor':
+        return 'set_color', (int(line[1]), int(line[2]), int(line[3]))
+    elif name == 'drawLine':
+        return 'draw_line', (sys.intern(line[1]), parse_points(line[2:6]), line[6])
+    elif name == 'drawPolygon':
+        return 'draw_polygon', (sys.intern(line[1]), parse_points(line[2:-1]), line[-1])
+    elif name == 'fillPolygon':
+        return 'fill_polygon', (sys.intern(line[1]), parse_points(line[2:]))
+    elif name == 'drawEllipse':
+        return 'draw_ellipse', (sys.intern(line[1]), parse_points(line[2:6]))
+    elif name == 'drawCurve':
+        return 'draw_curve', (sys.intern(line[1]), parse_points(line[2:-1]), line[-1])
+    elif name == 'translate':
+        return 'translate', (sys.intern(line[1]), int(line[2]), int(line[3]))
+    elif name == 'rotate':
+        return 'rotate', (sys.intern(line[1]), int(line[2]), int(line[3]), float(line[4]))
+    elif name == 'scale':
+        return 'scale', (sys.intern(line[1]), int(line[2]), int(line[3]), float(line[4]))
+    elif name == 'clip':
+        return 'clip', (sys.intern(line[1]), int(line[2]), int(line[3]), int(line[4]), int(line[5]), line[6])
+    return 'unknown', (name,)  # 执行到这里时报错，之前的指令照常执行
+
+
+def compile_instructions(lines):
+    """把指令文件的各行编译为操作列表，空行被忽略
+
+    :param lines: (iterable of str) 指令文件的各行
+    :return: (list of tuple: [(str, tuple), ...]) 编译后的操作列表，可以交给Interpreter.execute反复执行
+    """
+    ops = []
+    for line in lines:
+        line = line.split()
+        if line:
+            try:
+                ops.append(compile_instruction(line))
+            except (ValueError, IndexError):
+                ops.append(('invalid', (' '.join(line),)))  # 与未知指令一样，执行到这里时才报错
+    return ops
 
-if __name__ == '__main__':
 
+def compile_file(input_file):
+    """读取指令文件并编译为操作列表，二进制指令文件（见cg_scene）直接解码，不需要解析文本"""
+    import cg_scene
+
+    if cg_scene.is_scene(input_file):
+        return cg_scene.load(input_file)
     with open(input_file, 'r') as fp:
-        line = fp.readline()
-        while line:
-            line = line.strip().split(' ')
+        return compile_instructions(fp)
+
+
+STRIP_BYTES = 1 << 20  # 逐条写出画布时每条的大约字节数
+
+
+def strip_rows(width):
+    """宽为width的画布每条的行数"""
+    return max(1, STRIP_BYTES // (width * 3))
+
+
+def canvas_strips(canvas, reverse=False):
+    """把画布按行分成若干条依次给出，每条是不超过strip_rows行的(rows, width, 3)数组，reverse为True时自下而上
+    numpy画布给出的是视图；TiledCanvas的各条复制到同一块缓冲区中，取下一条之前要用完上一条
+    """
+    height, width = canvas.shape[:2]
+    step = strip_rows(width)
+    starts = range(0, height, step)
+    if isinstance(canvas, TiledCanvas):
+        buffer = np.empty([min(step, height), width, 3], np.uint8)
+        for y in reversed(starts) if reverse else starts:
+            yield canvas.read_rows(y, buffer[:min(step, height - y)])
+    else:
+        for y in reversed(starts) if reverse else starts:
+            yield canvas[y:y + step]
+
+
+def write_bmp(canvas, path):
+    """把(height, width, 3)的RGB画布写成24位BMP：各行自下而上、按BGR排列并补齐到4字节
+    行序翻转后整块复制，再交换R、B两个通道（比直接赋值canvas[::-1, :, ::-1]快得多），
+    文件头与像素数据通过memoryview写出，得到的文件与Pillow写出的逐字节相同；
+    画布按canvas_strips逐条写出，补齐后的各行放在同一块约STRIP_BYTES的缓冲区中，占用的内存与画布大小无关
+    """
+    height, width = canvas.shape[:2]
+    stride = (width * 3 + 3) & ~3
+    header = struct.pack('<2sIHHIIIIHHIIIIII', b'BM', 54 + stride * height, 0, 0, 54,
+                         40, width, height, 1, 24, 0, stride * height, 3780, 3780, 0, 0)
+    with open(path, 'wb') as fp:
+        fp.write(header)
+        buffer = np.zeros([min(strip_rows(width), height), stride], np.uint8)  # 行尾补齐的字节始终为0
+        for strip in canvas_strips(canvas, reverse=True):
+            rows = buffer[:len(strip)]
+            pixels = rows[:, :width * 3].reshape(len(strip), width, 3)
+            flipped = strip[::-1]
+            pixels[:] = flipped
+            pixels[..., 0] = flipped[..., 2]
+            pixels[..., 2] = flipped[..., 0]
+            fp.writelines([memoryview(rows)])
+
+
+def write_ppm(canvas, path):
+    """把(height, width, 3)的RGB画布写成二进制PPM(P6)，画布连续时像素数据不经复制直接写出"""
+    height, width = canvas.shape[:2]
+    with open(path, 'wb') as fp:
+        fp.write(b'P6\n%d %d\n255\n' % (width, height))
+        fp.writelines(memoryview(np.ascontiguousarray(strip)) for strip in canvas_strips(canvas))
+
+
+def write_image(canvas, path):
+    """按扩展名保存画布，.bmp和.ppm由内置的写出函数处理，其他格式需要Pillow"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.bmp':
+        write_bmp(canvas, path)
+    elif ext == '.ppm':
+        write_ppm(canvas, path)
+    else:
+        from PIL import Image
+        Image.fromarray(np.concatenate([np.array(strip) for strip in canvas_strips(canvas)])).save(path)
+
+
+class TiledCanvas:
+    """
+    分块的画布，用于很大的分辨率：像素按tile_size×tile_size的图块存放在内存映射的临时文件中，由操作系统换入换出，
+    占用的内存与画布大小无关；图元只写入其像素所在的图块，从未写过的图块视为白色，不占用磁盘
+    """
+
+    def __init__(self, width, height, tile_size=1024, tile_dir=None):
+        """
+        :param width: (int) 画布宽度
+        :param height: (int) 画布高度
+        :param tile_size: (int) 图块边长
+        :param tile_dir: (str) 存放内存映射临时文件的目录，默认为系统临时目录（可能是内存中的tmpfs，很大的画布应指定磁盘上的目录）
+        """
+        self.shape = (height, width, 3)
+        self.tile_size = tile_size
+        self.tiles_y = (height + tile_size - 1) // tile_size
+        self.tiles_x = (width + tile_size - 1) // tile_size
+        self.file = tempfile.TemporaryFile(dir=tile_dir)
+        self.tiles = np.memmap(self.file, np.uint8, 'w+', shape=(self.tiles_y, self.tiles_x, tile_size, tile_size, 3))
+        self.blank = np.ones([self.tiles_y, self.tiles_x], bool)  # 图块是否为白色（内容尚未写入）
+
+    def tile(self, ty, tx):
+        """第ty行第tx列的图块，第一次写入前先涂成白色"""
+        if self.blank[ty, tx]:
+            self.tiles[ty, tx].fill(255)
+            self.blank[ty, tx] = False
+        return self.tiles[ty, tx]
+
+    def clear(self, tiles):
+        """把tiles中的图块恢复为白色"""
+        for ty, tx in tiles:
+            self.blank[ty, tx] = True
+
+    def bbox_tiles(self, bbox):
+        """与包围盒相交的图块集合"""
+        x_min, y_min, x_max, y_max = bbox
+        size = self.tile_size
+        return {(ty, tx) for ty in range(max(y_min, 0) // size, min(y_max // size, self.tiles_y - 1) + 1)
+                for tx in range(max(x_min, 0) // size, min(x_max // size, self.tiles_x - 1) + 1)}
+
+    def paint_pixels(self, pixels, color, tiles=None):
+        """把像素点按所在图块分组写入，给出tiles时只写入其中的图块"""
+        height, width = self.shape[:2]
+        size = self.tile_size
+        xs, ys = pixels[:, 0], pixels[:, 1]
+        inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+        xs, ys = xs[inside], ys[inside]
+        if len(xs) == 0:
+            return
+        ids = ys // size * self.tiles_x + xs // size
+        order = np.argsort(ids, kind='stable')
+        xs, ys, ids = xs[order], ys[order], ids[order]
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]])
+        for start, stop in zip(starts, np.r_[starts[1:], len(ids)]):
+            ty, tx = divmod(int(ids[start]), self.tiles_x)
+            if tiles is None or (ty, tx) in tiles:
+                self.tile(ty, tx)[ys[start:stop] % size, xs[start:stop] % size] = color
+
+    def paint_spans(self, spans, color, tiles=None):
+        """把水平区段切成图块内的片段写入，给出tiles时只写入其中的图块"""
+        size = self.tile_size
+        for y, x0, x1 in spans:
+            ty, row = divmod(int(y), size)
+            for tx in range(x0 // size, x1 // size + 1):
+                if tiles is None or (ty, tx) in tiles:
+                    left = tx * size
+                    self.tile(ty, tx)[row, max(x0 - left, 0):min(x1 - left, size - 1) + 1] = color
+
+    def read_rows(self, y, out):
+        """把画布第y行起的len(out)行复制到(rows, width, 3)的数组out中并返回out"""
+        width = self.shape[1]
+        size = self.tile_size
+        row = y
+        while row < y + len(out):
+            ty, top = divmod(row, size)
+            count = min(size - top, y + len(out) - row)  # 在这行图块中的行数
+            for tx in range(self.tiles_x):
+                cols = min(size, width - tx * size)
+                target = out[row - y:row - y + count, tx * size:tx * size + cols]
+                if self.blank[ty, tx]:
+                    target[:] = 255
+                else:
+                    target[:] = self.tiles[ty, tx, top:top + count, :cols]
+            row += count
+        return out
+
+
+class ImageWriter:
+    """
+    后台保存图像：编码和写盘在线程池中进行，解释器提交后立即继续执行后面的指令
+    未完成的保存不超过max_pending个，超过时提交会等待，以限制画布副本占用的内存；
+    同一路径的多次保存按提交顺序完成；错误在wait时统一报告
+    """
+
+    def __init__(self, max_workers=2, max_pending=4, profiler=None):
+        """
+        :param max_workers: (int) 写图像的线程数，为0时在提交的线程中直接保存
+        :param max_pending: (int) 最多同时未完成的保存数
+        :param profiler: (Profiler) 给出时记录复制画布和编码写盘的耗时
+        """
+        self.max_workers = max_workers
+        self.profiler = profiler
+        self.slots = threading.BoundedSemaphore(max(max_pending, 1))
+        self.executor = None
+        self.pending = {}  # 路径 -> 该路径最近一次提交的保存
+        self.errors = []
+
+    def submit(self, canvas, path):
+        """保存canvas的当前内容，canvas之后可以继续修改；分块画布太大，不复制，在当前线程中直接保存"""
+        if self.max_workers <= 0 or isinstance(canvas, TiledCanvas):
+            previous = self.pending.pop(path, None)
+            if previous is not None:
+                previous.result()
+            self.write(canvas, path)
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        self.slots.acquire()
+        if self.profiler is not None:
+            start = time.perf_counter()
+        canvas = canvas.copy()
+        if self.profiler is not None:
+            self.profiler.add('stage', 'copy', time.perf_counter() - start)
+        self.pending[path] = self.executor.submit(self.run, canvas, path, self.pending.get(path))
+
+    def run(self, canvas, path, previous):
+        try:
+            if previous is not None:
+                previous.result()  # 等前一次写同一路径的保存完成，保证最后留下的是后提交的图像
+            self.write(canvas, path)
+        finally:
+            self.slots.release()
+
+    def write(self, canvas, path):
+        try:
+            if self.profiler is not None:
+                start = time.perf_counter()
+            write_image(canvas, path)
+            if self.profiler is not None:
+                self.profiler.add('stage', 'encode', time.perf_counter() - start)
+        except Exception as e:
+            self.errors.append(f'{path}: {type(e).__name__}: {e}')
+
+    def wait(self):
+        """等待所有保存完成并结束线程池，有保存失败时抛出ImageWriteError"""
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+        self.pending = {}
+        errors, self.errors = self.errors, []
+        if errors:
+            raise ImageWriteError(f'{len(errors)} image(s) failed to save:\n' + '\n'.join(errors))
+
+
+class Interpreter:
+    """
+    指令解释器，画布及图元等状态都保存在对象中，可以嵌入其他程序，在一个进程中执行多个指令文件
+    画布在两次保存之间保持不变，保存时只重绘新增或修改过的图元
+    """
+
+    def __init__(self, output_dir, writer=None, tiled_pixels=TILED_PIXELS, tile_size=1024, tile_dir=None,
+                 profiler=None):
+        """
+        :param output_dir: (str) 图像保存目录
+        :param writer: (ImageWriter) 保存图像的后台线程，默认新建一个
+        :param tiled_pixels: (int) 画布像素数超过该值时使用TiledCanvas
+        :param tile_size: (int) TiledCanvas的图块边长
+        :param tile_dir: (str) TiledCanvas存放内存映射文件的目录
+        :param profiler: (Profiler) 给出时记录各指令、算法、图元及各阶段的耗时
+        """
+        self.output_dir = output_dir
+        self.profiler = profiler
+        self.writer = writer if writer is not None else ImageWriter(profiler=profiler)
+        self.tiled_pixels = tiled_pixels
+        self.tile_size = tile_size
+        self.tile_dir = tile_dir
+        self.item_dict = {}
+        self.pen_color = np.zeros(3, np.uint8)
+        self.width = 0
+        self.height = 0
+        self.canvas = None  # 持久的画布，保存时只重绘有变化的部分
+        self.raster_cache = {}  # 图元编号 -> 上次保存时图元在画布上的绘制结果及其包围盒
+        self.dirty = set()  # 上次保存后新增或修改过的图元编号
+        self.index = alg.GridIndex()  # 图元在画布上实际像素的包围盒，保存时随绘制结果更新
+        self.positions = {}  # 图元编号 -> 绘制顺序
+
+    def execute(self, ops, snapshot_dir=None, snapshot_every=0):
+        """依次执行compile_instructions得到的操作，返回前等待所有图像保存完成
+
+        :param ops: (list of tuple) 操作列表
+        :param snapshot_dir: (str) 给出时每执行snapshot_every条操作，在该目录中写一个快照（见write_snapshot）
+        :param snapshot_every: (int) 快照的间隔
+        """
+        try:
+            if snapshot_dir is None or snapshot_every <= 0:
+                self.run_ops(ops)
+            else:
+                digest = hashlib.sha1()
+                for start in range(0, len(ops), snapshot_every):
+                    chunk = ops[start:start + snapshot_every]
+                    self.run_ops(chunk)
+                    for op in chunk:
+                        digest.update(repr(op).encode())
+                    if start + len(chunk) < len(ops):
+                        write_snapshot(snapshot_path(snapshot_dir, start + len(chunk)), start + len(chunk),
+                                       digest.digest(), self.state_ops())
+        except Exception:
             try:
-                func_dict[line[0]](line)
-            except KeyError:
-                print(f'[ERROR] :You call the nonexistent func: {line[0]}!!!')
-                exit()
-            # print(width, height, item_dict, pen_color)
-            line = fp.readline()
+                self.writer.wait()  # 出错前提交的图像照常保存，报告的是指令的错误
+            except ImageWriteError:
+                pass
+            raise
+        if self.profiler is not None:
+            start = time.perf_counter()
+        self.writer.wait()
+        if self.profiler is not None:
+            self.profiler.add('stage', 'flush', time.perf_counter() - start)
+
+    def run_ops(self, ops):
+        """执行操作，不等待图像保存完成"""
+        handlers = {}
+        if self.profiler is None:
+            for name, args in ops:
+                handler = handlers.get(name)
+                if handler is None:
+                    handler = handlers[name] = getattr(self, name)
+                handler(*args)
+        else:
+            self.run_ops_profiled(ops)
+
+    def run_ops_profiled(self, ops):
+        """与run_ops相同，另外记录每条指令按类型和图元编号累计的耗时（图元的光栅化在保存时进行，记在algorithm和stage中）"""
+        profiler = self.profiler
+        for name, args in ops:
+            handler = getattr(self, name)
+            start = time.perf_counter()
+            handler(*args)
+            seconds = time.perf_counter() - start
+            profiler.add('instruction', name, seconds)
+            if name in ITEM_OPS:
+                profiler.add('item', args[0], seconds)
+
+    def state_ops(self):
+        """重建当前状态（画布大小、图元及其颜色和算法、画笔颜色）的操作列表，画布内容由图元决定，不必保存"""
+        ops = []
+        if self.canvas is not None:
+            ops.append(('reset_canvas', (self.width, self.height)))
+        color = None
+        for item_id, (item_type, p_list, algorithm, item_color) in self.item_dict.items():
+            if color is None or (item_color != color).any():
+                color = item_color
+                ops.append(('set_color', tuple(color.tolist())))
+            name = DRAW_OPS[item_type]
+            if algorithm is None:
+                ops.append((name, (item_id, p_list)))
+            else:
+                ops.append((name, (item_id, p_list, algorithm)))
+        ops.append(('set_color', tuple(self.pen_color.tolist())))
+        return ops
+
+    def run_file(self, input_file):
+        self.execute(compile_file(input_file))
+
+    def unknown(self, name):
+        raise InstructionError(f'You call the nonexistent func: {name}!!!')
+
+    def invalid(self, line):
+        raise InstructionError(f'Invalid instruction: {line}')
+
+    def item(self, item_id):
+        """item_dict中的图元，编号不存在时抛出InstructionError"""
+        try:
+            return self.item_dict[item_id]
+        except KeyError:
+            raise InstructionError(f'No such item: {item_id}') from None
+
+    def reset_canvas(self, width, height):
+        self.width = width
+        self.height = height
+        self.item_dict = {}
+        if width * height > self.tiled_pixels:
+            self.canvas = TiledCanvas(width, height, self.tile_size, self.tile_dir)
+        else:
+            self.canvas = np.zeros([height, width, 3], np.uint8)
+            self.canvas.fill(255)
+        self.raster_cache = {}
+        self.dirty = set()
+        self.index = alg.GridIndex()
+        self.positions = {}
+
+    def make_raster(self, item_type, pixels):
+        """整理图元的绘制结果：负坐标换算为画布上实际写入的位置，画布以外的像素舍去、区段截取到画布以内（两种画布相同），并求出包围盒(x_min, y_min, x_max, y_max)"""
+        if item_type == 'fill_polygon':
+            spans = np.asarray(pixels, dtype=np.int64).reshape(-1, 3)
+            spans[:, 1] = np.maximum(spans[:, 1], 0)
+            spans[:, 2] = np.minimum(spans[:, 2], self.width - 1)
+            data = spans[(spans[:, 0] >= 0) & (spans[:, 0] < self.height) & (spans[:, 1] <= spans[:, 2])]
+            xs, ys = data[:, 1:], data[:, 0]
+        else:
+            data = np.asarray(pixels if pixels is not None else [], dtype=np.int64).reshape(-1, 2).copy()
+            data[:, 0] = np.where(data[:, 0] < 0, data[:, 0] + self.width, data[:, 0])
+            data[:, 1] = np.where(data[:, 1] < 0, data[:, 1] + self.height, data[:, 1])
+            data = data[(data[:, 0] >= 0) & (data[:, 0] < self.width) & (data[:, 1] >= 0) & (data[:, 1] < self.height)]
+            xs, ys = data[:, 0], data[:, 1]
+        bbox = (xs.min(), ys.min(), xs.max(), ys.max()) if len(data) else None
+        return item_type, data, bbox
+
+    def paint_raster(self, raster, color, mask=None):
+        """将make_raster整理好的绘制结果写入画布，分块画布上mask为要写入的图块集合"""
+        item_type, data, bbox = raster
+        if isinstance(self.canvas, TiledCanvas):
+            if item_type == 'fill_polygon':
+                self.canvas.paint_spans(data, color, mask)
+            else:
+                self.canvas.paint_pixels(data, color, mask)
+        elif item_type == 'fill_polygon':
+            paint_spans(self.canvas, data, color, mask)
+        else:
+            paint_pixels(self.canvas, data, color, mask)
+
+    def repaint_dirty(self):
+        """重绘上次保存后新增或修改过的图元
+        这些图元新旧位置覆盖的区域先恢复为白色，再按绘制顺序重绘与该区域相交的所有图元（只写入该区域，相交的图元由空间索引查出），保证后画的覆盖先画的；
+        若变化的只是排在最后的新图元，则直接画在画布上
+        """
+        order = list(self.item_dict)
+        ids = [item_id for item_id in order if item_id in self.dirty]
+        if self.profiler is not None:
+            start = time.perf_counter()
+        rasters = {item_id: self.make_raster(self.item_dict[item_id][0], pixels)
+                   for item_id, pixels in zip(ids, rasterize_items([self.item_dict[i] for i in ids], self.profiler))}
+        for item_id, raster in rasters.items():
+            self.index.update(item_id, None if raster[2] is None else tuple(int(v) for v in raster[2]))
+        if self.profiler is not None:
+            self.profiler.add('stage', 'rasterize', time.perf_counter() - start)
+            start = time.perf_counter()
+        appended = all(i not in self.raster_cache for i in ids) and order[len(order) - len(ids):] == ids
+        if appended:
+            for item_id in ids:
+                self.paint_raster(rasters[item_id], self.item_dict[item_id][3])
+        elif isinstance(self.canvas, TiledCanvas):
+            # 分块画布上以图块为单位重绘：清空变化图元新旧包围盒覆盖的图块，再按顺序把图元写入这些图块
+            tiles = set()
+            for item_id in ids:
+                for raster in (self.raster_cache.get(item_id), rasters[item_id]):
+                    if raster is not None and raster[2] is not None:
+                        tiles |= self.canvas.bbox_tiles(raster[2])
+            self.canvas.clear(tiles)
+            size = self.canvas.tile_size
+            candidates = set()
+            for ty, tx in tiles:
+                candidates |= self.index.query_rect(tx * size, ty * size, tx * size + size - 1, ty * size + size - 1)
+            for item_id in sorted(candidates, key=self.positions.__getitem__):
+                raster = rasters[item_id] if item_id in rasters else self.raster_cache[item_id]
+                self.paint_raster(raster, self.item_dict[item_id][3], tiles)
+        else:
+            mask = np.zeros([self.height, self.width], bool)
+            for item_id in ids:
+                if item_id in self.raster_cache:
+                    mark_raster(mask, self.raster_cache[item_id])
+                mark_raster(mask, rasters[item_id])
+            rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+            if len(rows):
+                self.canvas[mask] = 255
+                for item_id in sorted(self.index.query_rect(int(cols[0]), int(rows[0]), int(cols[-1]), int(rows[-1])),
+                                      key=self.positions.__getitem__):
+                    raster = rasters[item_id] if item_id in rasters else self.raster_cache[item_id]
+                    self.paint_raster(raster, self.item_dict[item_id][3], mask)
+        if self.profiler is not None:
+            self.profiler.add('stage', 'paint', time.perf_counter() - start)
+        self.raster_cache.update(rasters)
+        self.dirty = set()
+
+    def items_in(self, x_min, y_min, x_max, y_max):
+        """包围盒与矩形相交的图元编号，按绘制顺序排列"""
+        if self.dirty:
+            self.repaint_dirty()
+        return sorted(self.index.query_rect(x_min, y_min, x_max, y_max), key=self.positions.__getitem__)
+
+    def pick(self, x, y, tolerance=0):
+        """在点(x, y)附近tolerance范围内有像素的图元中，返回最上层（最后绘制）的编号，没有时返回None"""
+        for item_id in reversed(self.items_in(x - tolerance, y - tolerance, x + tolerance, y + tolerance)):
+            item_type, data, bbox = self.raster_cache[item_id]
+            if item_type == 'fill_polygon':
+                near = (np.abs(data[:, 0] - y) <= tolerance) & (data[:, 1] <= x + tolerance) & (x - tolerance <= data[:, 2])
+            else:
+                near = (np.abs(data[:, 0] - x) <= tolerance) & (np.abs(data[:, 1] - y) <= tolerance)
+            if near.any():
+                return item_id
+        return None
+
+    def save_canvas(self, save_name):
+        if self.dirty:
+            self.repaint_dirty()
+        self.writer.submit(self.canvas, os.path.join(self.output_dir, save_name + '.bmp'))
+
+    def set_color(self, r, g, b):
+        self.pen_color[0] = r
+        self.pen_color[1] = g
+        self.pen_color[2] = b
+
+    def add_item(self, item_id, item_type, p_list, algorithm):
+        if item_id not in self.item_dict:  # 重复使用的编号保持原来的绘制顺序，与item_dict一致
+            self.positions[item_id] = len(self.positions)
+        self.item_dict[item_id] = [item_type, p_list, algorithm, np.array(self.pen_color)]
+        self.dirty.add(item_id)
+
+    def draw_line(self, item_id, p_list, algorithm):
+        self.add_item(item_id, 'line', p_list, algorithm)
+
+    def draw_polygon(self, item_id, p_list, algorithm):
+        self.add_item(item_id, 'polygon', p_list, algorithm)
+
+    def fill_polygon(self, item_id, p_list):
+        self.add_item(item_id, 'fill_polygon', p_list, None)
+
+    def draw_ellipse(self, item_id, p_list):
+        self.add_item(item_id, 'ellipse', p_list, None)
+
+    def draw_curve(self, item_id, p_list, algorithm):
+        self.add_item(item_id, 'curve', p_list, algorithm)
+
+    def translate(self, item_id, dx, dy):
+        item = self.item(item_id)
+        p_list = item[1]  # 图元原本的参数
+        item[1] = alg.translate(p_list, dx, dy)  # 修改成平移后的参数
+        self.dirty.add(item_id)
+
+    def rotate(self, item_id, x, y, r):
+        item = self.item(item_id)
+        p_list = item[1]  # 图元原本的参数
+        item[1] = alg.rotate(p_list, x, y, r)  # 修改成旋转后的参数
+        self.dirty.add(item_id)
+
+    def scale(self, item_id, x, y, s):
+        item = self.item(item_id)
+        p_list = item[1]  # 图元原本的参数
+        item[1] = alg.scale(p_list, x, y, s)  # 修改成缩放后的参数
+        self.dirty.add(item_id)
+
+    def clip(self, item_id, x_min, y_min, x_max, y_max, algorithm):
+        item = self.item(item_id)
+        p_list = [item[1][0], item[1][1]]  # 图元原本的参数，p_list是线段的起点和终点
+        item[1] = alg.clip(p_list, x_min, y_min, x_max, y_max, algorithm)  # 修改成裁剪后的参数
+        self.dirty.add(item_id)
+
+
+def split_segments(ops):
+    """在resetCanvas处把操作列表切分为互不依赖的片段，每个片段可以交给单独的Interpreter执行，结果与依次执行相同
+    resetCanvas会清空所有图元，但不会重置画笔颜色，所以每个片段开头补上一条设置当时画笔颜色的操作；
+    遇到未知或无法解析的指令时，只保留到该指令为止的操作
+
+    :param ops: (list of tuple) compile_instructions得到的操作列表
+    :return: (list of list) 各片段的操作列表
+    """
+    for index, (name, args) in enumerate(ops):
+        if name == 'unknown' or name == 'invalid':
+            ops = ops[:index + 1]
+            break
+    segments = []
+    pen_color = (0, 0, 0)
+    for name, args in ops:
+        if name == 'reset_canvas' or not segments:
+            segments.append([('set_color', pen_color)])
+        if name == 'set_color':
+            pen_color = args
+        segments[-1].append((name, args))
+    return segments
+
+
+SNAPSHOT_MAGIC = b'CGSN'
+SNAPSHOT_HEADER = struct.Struct('<4sQ20s')
+
+
+def snapshot_path(snapshot_dir, index):
+    return os.path.join(snapshot_dir, '%d.cgsnap' % index)
+
+
+def write_snapshot(path, index, digest, state_ops):
+    """写一个快照：执行完前index条操作后的状态
+
+    :param path: (str) 快照文件路径
+    :param index: (int) 已执行的操作条数
+    :param digest: (bytes) 前index条操作的SHA-1，恢复时用来确认指令文件的这部分没有改动
+    :param state_ops: (list of tuple) Interpreter.state_ops得到的操作，以cg_scene的二进制格式保存
+    """
+    import cg_scene
+
+    with open(path, 'wb') as fp:
+        fp.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, index, digest))
+        fp.writelines(cg_scene.encode(state_ops))
+
+
+def read_snapshot(path):
+    """读取快照，返回(index, digest, state_ops)"""
+    import cg_scene
+
+    with open(path, 'rb') as fp:
+        data = fp.read()
+    magic, index, digest = SNAPSHOT_HEADER.unpack_from(data, 0)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError(f'{path} is not a snapshot')
+    return index, digest, cg_scene.decode(memoryview(data)[SNAPSHOT_HEADER.size:])
+
+
+def resume_ops(ops, snapshot_dir, start):
+    """从start之前最近的可用快照恢复，得到与执行全部操作时start及之后的输出相同的操作列表
+    快照中的状态操作之后接上快照之后的操作，其中start之前的保存被省去；前缀与快照记录不一致的快照被忽略
+
+    :param ops: (list of tuple) 整个指令文件的操作列表
+    :param snapshot_dir: (str) 快照目录
+    :param start: (int) 需要重新输出的第一条操作的下标
+    :return: (tuple: (list of tuple, int)) 操作列表，所用快照的位置（没有可用快照时为0）
+    """
+    indices = []
+    if os.path.isdir(snapshot_dir):
+        for name in os.listdir(snapshot_dir):
+            stem, ext = os.path.splitext(name)
+            if ext == '.cgsnap' and stem.isdigit() and int(stem) <= start:
+                indices.append(int(stem))
+    digests = {}
+    digest = hashlib.sha1()
+    targets = set(indices)
+    for i, op in enumerate(ops[:max(indices, default=0)]):
+        digest.update(repr(op).encode())
+        if i + 1 in targets:
+            digests[i + 1] = digest.digest()
+    for index in sorted(indices, reverse=True):
+        saved_index, saved_digest, state = read_snapshot(snapshot_path(snapshot_dir, index))
+        if saved_index == index and digests.get(index) == saved_digest:
+            break
+    else:
+        index, state = 0, []
+    tail = [op for i, op in enumerate(ops[index:start], index) if op[0] != 'save_canvas']
+    return state + tail + ops[start:], index
+
+
+def instruction_lines(input_file):
+    """每条操作在指令文件中的行号（从1开始），二进制指令文件中为记录的序号"""
+    import cg_scene
+
+    if cg_scene.is_scene(input_file):
+        return list(range(1, len(cg_scene.load(input_file)) + 1))
+    with open(input_file, 'r') as fp:
+        return [number for number, line in enumerate(fp, 1) if line.split()]
+
+
+def render_segment(task):
+    """执行一个片段，profile为True时返回该片段的Profiler.stats"""
+    output_dir, ops, profile, tile_dir = task
+    profiler = Profiler() if profile else None
+    Interpreter(output_dir, tile_dir=tile_dir, profiler=profiler).execute(ops)
+    return profiler.stats if profile else None
+
+
+def commit_segment(staging_dir, output_dir):
+    """把一个片段保存在暂存目录中的图像移入图像保存目录，覆盖前面片段保存的同名图像"""
+    for name in sorted(os.listdir(staging_dir)):
+        os.replace(os.path.join(staging_dir, name), os.path.join(output_dir, name))
+
+
+def run_parallel(ops, output_dir, jobs=None, profiler=None, tile_dir=None):
+    """把操作列表按resetCanvas切分后用进程池并行执行，输出的图像与依次执行相同
+    各片段先把图像保存到自己的暂存目录，再按片段的顺序移入图像保存目录；某个片段出错时，
+    只移入该片段出错前保存的图像，之后的片段即使已经执行完也被丢弃，然后抛出该片段的异常
+
+    :param ops: (list of tuple) compile_instructions得到的操作列表
+    :param output_dir: (str) 图像保存目录
+    :param jobs: (int) 工作进程数，默认为CPU核数
+    :param profiler: (Profiler) 给出时汇总各片段的耗时
+    :param tile_dir: (str) 大画布（TiledCanvas）存放内存映射文件的目录
+    """
+    segments = split_segments(ops)
+    profile = profiler is not None
+    jobs = min(jobs or os.cpu_count() or 1, len(segments))
+    if jobs <= 1:  # 依次执行，出错时后面的片段不会执行
+        for segment in segments:
+            stats = render_segment((output_dir, segment, profile, tile_dir))
+            if stats is not None:
+                profiler.merge(stats)
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    staging = [tempfile.mkdtemp(prefix='.segment', dir=output_dir) for _ in segments]
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    futures = [executor.submit(render_segment, (staging_dir, segment, profile, tile_dir))
+               for staging_dir, segment in zip(staging, segments)]
+    try:
+        for staging_dir, future in zip(staging, futures):
+            try:
+                stats = future.result()
+            finally:
+                commit_segment(staging_dir, output_dir)  # 出错的片段在出错前保存的图像同样保留
+            if stats is not None:
+                profiler.merge(stats)
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown()
+        for staging_dir in staging:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='执行指令文件')
+    parser.add_argument('input_file', help='指令文件的路径')
+    parser.add_argument('output_dir', help='图像保存目录')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='并行执行各resetCanvas片段的进程数，默认为CPU核数，为1时依次执行')
+    parser.add_argument('--snapshot-dir', help='快照目录，与--snapshot-every或--resume-from一起使用')
+    parser.add_argument('--snapshot-every', type=int, default=0, metavar='N',
+                        help='每执行N条指令写一个快照（写快照时依次执行，不并行）')
+    parser.add_argument('--resume-from', type=int, metavar='LINE',
+                        help='从该行之前最近的快照恢复，只重新输出该行及之后保存的图像')
+    parser.add_argument('--profile', metavar='REPORT',
+                        help='记录各指令类型、算法、图元及各阶段的耗时，写入JSON文件REPORT，并打印按耗时排序的摘要')
+    parser.add_argument('--tile-dir', metavar='DIR',
+                        help='大画布存放内存映射文件的目录，默认为系统临时目录')
+    args = parser.parse_args(argv[1:])
+    if (args.resume_from is not None or args.snapshot_every) and not args.snapshot_dir:
+        parser.error('--resume-from and --snapshot-every require --snapshot-dir')
+    os.makedirs(args.output_dir, exist_ok=True)
+    profiler = Profiler() if args.profile else None
+    try:
+        start = time.perf_counter()
+        ops = compile_file(args.input_file)
+        if profiler is not None:
+            profiler.add('stage', 'parse', time.perf_counter() - start)
+        if args.resume_from is not None and args.snapshot_dir:
+            first = bisect.bisect_left(instruction_lines(args.input_file), args.resume_from)
+            ops, _ = resume_ops(ops, args.snapshot_dir, first)
+            run_parallel(ops, args.output_dir, args.jobs, profiler, args.tile_dir)
+        elif args.snapshot_dir and args.snapshot_every > 0:
+            os.makedirs(args.snapshot_dir, exist_ok=True)
+            interpreter = Interpreter(args.output_dir, tile_dir=args.tile_dir, profiler=profiler)
+            interpreter.execute(ops, args.snapshot_dir, args.snapshot_every)
+        else:
+            run_parallel(ops, args.output_dir, args.jobs, profiler, args.tile_dir)
+    except (InstructionError, ImageWriteError) as e:
+        print(f'[ERROR] :{e}')
+        exit()
+    finally:
+        if profiler is not None:
+            profiler.wall = time.perf_counter() - start
+            with open(args.profile, 'w') as fp:
+                json.dump(profiler.report(), fp, indent=2)
+            print(profiler.summary(), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -1,12 +1,13 @@
 #!/usr/bin/env python
 # -*- coding:utf-8 -*-
 
+import itertools
 import sys
 from typing import Optional
 
 from PyQt5 import QtCore, QtGui
-from PyQt5.QtCore import QRectF, Qt
-from PyQt5.QtGui import QPainter, QMouseEvent, QColor, QPixmap, QIcon, QPen
+from PyQt5.QtCore import QPoint, QRect, QRectF, Qt
+from PyQt5.QtGui import QPainter, QMouseEvent, QColor, QPixmap, QIcon, QPen, QImage
 from PyQt5.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -25,6 +26,28 @@ from PyQt5.QtWidgets import (
 
 import cg_algorithms as alg
 
+raster_cache = alg.RasterCache(adaptive=True)  # 所有图元共用的绘制结果缓存
+MAX_PEN_WIDTH = 10  # 画笔宽度的上限
+
+
+def paint_raster(painter, item_type, pixels, color, width):
+    """把图元的绘制结果一次提交给Qt
+    宽度为w的像素是以它为中心、左上角在(x - w // 2, y - w // 2)的w×w方块，与QPen画宽点的结果相同；
+    直接用整数矩形填充，不经过Qt画宽点时的浮点运算，结果与画在哪里无关（Qt的宽点在某些坐标上会多出一列）
+
+    :param painter: (QPainter) 目标画笔
+    :param item_type: (str) 图元类型，'fill_polygon'的pixels为水平区段(y, x0, x1)，其他为像素点(x, y)
+    :param color: (QColor) 颜色
+    :param width: (int) 画笔宽度
+    """
+    half = width // 2
+    painter.setPen(Qt.NoPen)
+    painter.setBrush(color)
+    if item_type == 'fill_polygon':  # 每个水平区段连同两端画笔的宽度是一个矩形
+        painter.drawRects([QRect(x0 - half, y - half, x1 - x0 + width, width) for y, x0, x1 in pixels])
+    else:
+        painter.drawRects([QRect(x - half, y - half, width, width) for x, y in pixels])
+
 
 class MyCanvas(QGraphicsView):
     """
@@ -37,6 +60,9 @@ class MyCanvas(QGraphicsView):
         self.list_widget = None
         self.item_dict = {}
         self.selected_id = ''
+        self.index = alg.GridIndex()  # 图元包围盒的网格索引，用于鼠标点选
+        self.positions = {}  # 图元编号 -> 加入画布的顺序，点选时后画的图元在上
+        self.position_counter = itertools.count()  # 删除图元后顺序号也不会重复
 
         self.status = ''
         self.temp_algorithm = ''
@@ -243,9 +269,39 @@ class MyCanvas(QGraphicsView):
                                     QColor(0, 255, 0))  # 裁剪时画一个矩形框
             self.scene().addItem(self.temp_item)
 
+        elif self.status == '' and event.button() == QtCore.Qt.LeftButton:  # 空闲时单击选择图元
+            item_id = self.pick_item(x, y)
+            if item_id is not None:
+                found = self.list_widget.findItems(item_id, QtCore.Qt.MatchExactly)
+                if found:
+                    self.list_widget.setCurrentItem(found[0])  # 触发selection_changed
+
         self.updateScene([self.sceneRect()])
         super().mousePressEvent(event)
 
+    def pick_item(self, x, y, tolerance=3):
+        """返回(x, y)处最上层的图元编号，没有时返回None
+        先用网格索引找出包围盒在附近的图元，再逐个检查其像素是否落在tolerance（加上画笔宽度）之内
+
+        :param x: (int) 点击位置横坐标
+        :param y: (int) 点击位置纵坐标
+        :param tolerance: (int) 允许的像素距离
+        :return: (str) 图元编号
+        """
+        reach = tolerance + MAX_PEN_WIDTH // 2  # 索引中是控制点的包围盒，画笔较宽时像素会超出
+        candidates = self.index.query_point(x, y, reach)
+        for item_id in sorted(candidates, key=self.positions.__getitem__, reverse=True):
+            item = self.item_dict[item_id]
+            d = tolerance + item.width // 2
+            pixels = raster_cache.draw(item.item_type, item.p_list, item.algorithm)
+            if item.item_type == 'fill_polygon':
+                hit = any(abs(py - y) <= d and x0 - d <= x <= x1 + d for py, x0, x1 in pixels)
+            else:
+                hit = any(abs(px - x) <= d and abs(py - y) <= d for px, py in pixels)
+            if hit:
+                return item_id
+        return None
+
     def mouseMoveEvent(self, event: QMouseEvent) -> None:
         pos = self.mapToScene(event.localPos().toPoint())
         x = int(pos.x())
@@ -279,10 +335,15 @@ class MyCanvas(QGraphicsView):
 
     def add_item(self):
         self.item_dict[self.temp_id] = self.temp_item
+        self.positions[self.temp_id] = next(self.position_counter)
+        self.temp_item.spatial_index = self.index  # 之后对p_list的赋值会同步更新索引
+        self.index.update(self.temp_id, alg.bounding_box(self.temp_item.p_list))
         self.list_widget.addItem(self.temp_id)
         self.finish_draw()
 
     def delete_item(self):  # 删除当前selected的图元
+        self.index.remove(self.selected_id)
+        self.positions.pop(self.selected_id, None)
         self.scene().removeItem(self.item_dict.pop(self.selected_id))
         self.selected_id = ''
         self.temp_id = ''
@@ -375,6 +436,9 @@ class MyCanvas(QGraphicsView):
             self.scene().removeItem(self.item_dict[id])
         self.item_dict = {}
         self.selected_id = ''
+        self.index.clear()
+        self.positions = {}
+        self.position_counter = itertools.count()
 
         self.status = ''
         self.temp_algorithm = ''
@@ -405,28 +469,61 @@ class MyItem(QGraphicsItem):
         super().__init__(parent)
         self.id = item_id  # 图元ID
         self.item_type = item_type  # 图元类型，'line'、'polygon'、'ellipse'、'curve'等
+        self.spatial_index = None  # 加入画布后为画布的网格索引
         self.p_list = p_list  # 图元参数
         self.algorithm = algorithm  # 绘制算法，'DDA'、'Bresenham'、'Bezier'、'B-spline'等
         self.selected = False
         self.color = color  # 画笔颜色
         self.width = width # 画笔宽度
+        self.image_key = None  # 生成缓存图像时的参数，参数改变后重新生成
+        self.image = None  # 缓存的绘制结果，(左上角, QImage)
+
+    @property
+    def p_list(self):
+        return self._p_list
+
+    @p_list.setter
+    def p_list(self, p_list):
+        self._p_list = p_list
+        if self.spatial_index is not None:
+            self.spatial_index.update(self.id, alg.bounding_box(p_list))
+
+    def render_image(self):
+        """把图元的绘制结果画到透明背景的QImage上
+        绘制中的图元会原地修改p_list，所以按参数的内容而不是对象判断缓存是否失效
+
+        :return: (tuple: (QPoint, QImage)) 图像左上角在画布上的位置和图像，没有像素时为None
+        """
+        key = (self.item_type, tuple(map(tuple, self.p_list)), self.algorithm, self.color.rgba(), self.width)
+        if key == self.image_key:
+            return self.image
+        pixels = raster_cache.draw(self.item_type, self.p_list, self.algorithm)
+        self.image_key, self.image = key, None
+        if len(pixels) == 0:
+            return None
+        if self.item_type == 'fill_polygon':  # 填充结果为水平区段(y, x0, x1)
+            x_min, x_max = min(p[1] for p in pixels), max(p[2] for p in pixels)
+            y_min, y_max = min(p[0] for p in pixels), max(p[0] for p in pixels)
+        else:
+            x_min, x_max = min(p[0] for p in pixels), max(p[0] for p in pixels)
+            y_min, y_max = min(p[1] for p in pixels), max(p[1] for p in pixels)
+        margin = 2 * self.width + 2  # 画笔宽度大于1时像素向四周扩展，留出足够的边距，图像边缘不会截去任何像素
+        origin = QPoint(int(x_min) - margin, int(y_min) - margin)
+        image = QImage(int(x_max - x_min) + 2 * margin + 1, int(y_max - y_min) + 2 * margin + 1,
+                       QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        painter.translate(-origin.x(), -origin.y())
+        paint_raster(painter, self.item_type, pixels, self.color, self.width)  # 整个图元的像素一次提交给Qt
+        painter.end()
+        self.image = (origin, image)
+        return self.image
 
     def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget: Optional[QWidget] = ...) -> None:
         if len(self.p_list) == 0: return
-        if self.item_type == 'line':
-            item_pixels = alg.draw_line(self.p_list, self.algorithm)
-        elif self.item_type == 'polygon':
-            item_pixels = alg.draw_polygon(self.p_list, self.algorithm)
-        elif self.item_type == 'fill_polygon':
-            item_pixels = alg.fill_polygon(self.p_list)
-        elif self.item_type == 'ellipse':
-            item_pixels = alg.draw_ellipse(self.p_list)
-        elif self.item_type == 'curve':
-            item_pixels = alg.draw_curve(self.p_list, self.algorithm)
-
-        for p in item_pixels:
-            painter.setPen(QPen(self.color, self.width))
-            painter.drawPoint(*p)
+        image = self.render_image()  # 参数未变时直接使用缓存的图像
+        if image is not None:
+            painter.drawImage(*image)
         if self.selected:
             painter.setPen(QColor(255, 0, 0))
             painter.drawRect(self.boundingRect())
@@ -769,7 +866,7 @@ class MainWindow(QMainWindow):
         self.canvas_widget.clear_selection()
 
     def set_pen_width_action(self):
-        width, ok = QInputDialog.getInt(self, '调整粗细', '输入画笔粗细', value=1, min=1, max=10)
+        width, ok = QInputDialog.getInt(self, '调整粗细', '输入画笔粗细', value=1, min=1, max=MAX_PEN_WIDTH)
         if ok and width > 0:
             self.pen_width = width
 
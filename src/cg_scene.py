@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+"""
+二进制指令文件：把指令文件存为定长记录，执行时通过内存映射直接读取，不再逐个切分和转换文本
+
+文件结构（小端）：
+    文件头    MAGIC, 版本, 记录数, 字符串表字节数, 整数个数, 浮点数个数
+    字符串表  图元编号、算法名、保存的图像名，以换行分隔（文本格式以空白分隔，所以其中不会有换行）
+    记录      每条指令一个16字节的RECORD，op为OPS中的下标，id和name为字符串表中的下标（没有时为-1），
+              count为该指令的整数参数个数，各指令的整数参数在整数表中依次排列
+    整数表    int32，坐标、颜色、画布宽高等
+    浮点数表  float64，旋转角度和缩放倍数，按指令顺序排列
+"""
+
+import gc
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+MAGIC = b'CGSC'
+VERSION = 1
+HEADER = struct.Struct('<4sIIIQQ')
+RECORD = np.dtype([('op', 'u1'), ('pad', 'u1', (3,)), ('count', '<u4'), ('id', '<i4'), ('name', '<i4')])
+OPS = ['reset_canvas', 'save_canvas', 'set_color', 'draw_line', 'draw_polygon', 'fill_polygon',
+       'draw_ellipse', 'draw_curve', 'translate', 'rotate', 'scale', 'clip', 'unknown', 'invalid']
+OP_CODES = {name: code for code, name in enumerate(OPS)}
+INT32_MIN, INT32_MAX = -2 ** 31, 2 ** 31 - 1  # 整数表中坐标和颜色的范围
+
+
+def is_scene(path):
+    """文件是否为二进制指令文件"""
+    with open(path, 'rb') as fp:
+        return fp.read(len(MAGIC)) == MAGIC
+
+
+def encode(ops):
+    """把compile_instructions得到的操作列表编码为二进制指令文件的内容
+
+    :param ops: (list of tuple) 操作列表
+    :return: (list of bytes-like) 依次写出即为文件内容
+    """
+    strings = {}  # 字符串 -> 下标
+
+    def intern(s):
+        return strings.setdefault(s, len(strings))
+
+    columns = {'op': [], 'count': [], 'id': [], 'name': []}
+    ints = []
+    floats = []
+    for name, args in ops:
+        item, text, start = -1, -1, len(ints)
+        if name == 'save_canvas' or name == 'unknown' or name == 'invalid':
+            text = intern(args[0])
+            args = ()
+        elif name != 'reset_canvas' and name != 'set_color':
+            item = intern(args[0])
+            args = args[1:]
+        for arg in args:
+            if isinstance(arg, list):
+                for x, y in arg:
+                    ints += (x, y)
+            elif isinstance(arg, str):
+                text = intern(arg)
+            elif isinstance(arg, float):
+                floats.append(arg)
+            else:
+                ints.append(arg)
+        for key, v in (('op', OP_CODES[name]), ('count', len(ints) - start), ('id', item), ('name', text)):
+            columns[key].append(v)
+    records = np.zeros(len(ops), RECORD)
+    for key, values in columns.items():
+        records[key] = values
+    table = '\n'.join(strings).encode('utf-8')
+    ints = np.array(ints, np.int64)
+    if len(ints) and (ints.min() < INT32_MIN or ints.max() > INT32_MAX):
+        bad = ints[(ints < INT32_MIN) | (ints > INT32_MAX)][0]
+        raise ValueError(f'integer argument {bad} does not fit in the int32 fields of a binary scene file')
+    ints = ints.astype('<i4')
+    floats = np.array(floats, '<f8')
+    return [HEADER.pack(MAGIC, VERSION, len(records), len(table), len(ints), len(floats)), table,
+            memoryview(records), memoryview(ints), memoryview(floats)]
+
+
+def convert(input_file, output_file):
+    """把文本指令文件转换为二进制指令文件"""
+    import cg_cli
+
+    with open(output_file, 'wb') as fp:
+        fp.writelines(encode(cg_cli.compile_file(input_file)))
+
+
+def decode(buffer):
+    """把二进制指令文件的内容解码为与compile_instructions相同的操作列表
+    记录、整数表和浮点数表直接在buffer上读取，各列一次性转换为Python对象，不再逐个解析文本
+    """
+    magic, version, record_count, table_size, int_count, float_count = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a binary scene file of version %d' % VERSION)
+    offset = HEADER.size
+    strings = [sys.intern(str(s, 'utf-8')) for s in bytes(buffer[offset:offset + table_size]).split(b'\n')]
+    offset += table_size
+    records = np.frombuffer(buffer, RECORD, record_count, offset)
+    offset += records.nbytes
+    ints = np.frombuffer(buffer, '<i4', int_count, offset).tolist()
+    offset += int_count * 4
+    floats = iter(np.frombuffer(buffer, '<f8', float_count, offset).tolist())
+
+    ops = []
+    start = 0
+    for code, count, item, name in zip(records['op'].tolist(), records['count'].tolist(),
+                                       records['id'].tolist(), records['name'].tolist()):
+        op = OPS[code]
+        values = ints[start:start + count]
+        start += count
+        if op == 'reset_canvas' or op == 'set_color':
+            args = tuple(values)
+        elif op == 'save_canvas' or op == 'unknown' or op == 'invalid':
+            args = (strings[name],)
+        elif op == 'draw_line' or op == 'draw_polygon' or op == 'draw_curve':
+            args = (strings[item], list(map(list, zip(values[0::2], values[1::2]))), strings[name])
+        elif op == 'fill_polygon' or op == 'draw_ellipse':
+            args = (strings[item], list(map(list, zip(values[0::2], values[1::2]))))
+        elif op == 'translate':
+            args = (strings[item], *values)
+        elif op == 'rotate' or op == 'scale':
+            args = (strings[item], *values, next(floats))
+        else:  # clip
+            args = (strings[item], *values, strings[name])
+        ops.append((op, args))
+    return ops
+
+
+def load(path):
+    """内存映射二进制指令文件并解码为操作列表
+    解码时会新建大量列表，期间暂停垃圾回收，避免分代回收反复遍历已建好的操作列表（大文件上占了解码时间的大部分）
+    """
+    with open(path, 'rb') as fp:
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            enabled = gc.isenabled()
+            gc.disable()
+            try:
+                return decode(buffer)
+            finally:
+                if enabled:
+                    gc.enable()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('usage: python cg_scene.py input.txt output.cgs')
+        sys.exit(1)
+    try:
+        convert(sys.argv[1], sys.argv[2])
+    except ValueError as e:
+        print(f'[ERROR] :{e}')
+        sys.exit(1)
@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+# -*- coding:utf-8 -*-
+
+# 本文件是cg_algorithms的numpy向量化版本，依赖numpy库
+# cg_algorithms按要求只依赖math库，这里的实现与其逐点保持一致，但以整个数组为单位计算，供cg_cli等对速度敏感的场合使用
+# 仿射变换例外：transform只有给出变换中心时才与cg_algorithms.rotate/scale逐点相同，复合矩阵只在最后取整一次，与逐次变换的结果可能相差1像素
+import math
+
+import numpy as np
+
+import cg_algorithms as alg
+
+
+def _points(xs, ys):
+    """将横纵坐标数组合并为(N, 2)的整数像素点数组"""
+    return np.stack([xs, ys], axis=1).astype(np.int64, copy=False)
+
+
+def _as_int(a):
+    """转为整数数组，浮点坐标（如transform保留的浮点结果）在此四舍五入"""
+    a = np.asarray(a)
+    if a.dtype.kind == 'f':
+        a = np.rint(a)
+    return a.astype(np.int64, copy=False)
+
+
+def _accumulate(start, step, n):
+    """DDA中的增量累加：依次为start, start+step, start+step+step, ...（与逐次浮点加法结果一致）"""
+    seq = np.full(n, step, dtype=np.float64)
+    seq[0] = start
+    return np.rint(np.add.accumulate(seq))  # rint与round相同，都是四舍六入五成双
+
+
+def draw_line(p_list, algorithm):
+    """绘制线段（向量化实现，结果与cg_algorithms.draw_line相同）
+
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1]]) 线段的起点和终点坐标
+    :param algorithm: (string) 绘制使用的算法，包括'Naive'、'DDA'和'Bresenham'
+    :return: (numpy.ndarray of int, shape (N, 2): [[x_0, y_0], [x_1, y_1], ...]) 绘制结果的像素点坐标数组
+    """
+    x0, y0 = p_list[0]
+    x1, y1 = p_list[1]
+    if algorithm == 'Naive':
+        if x0 == x1:
+            ys = np.arange(y0, y1 + 1)
+            return _points(np.full(len(ys), x0), ys)
+        if x0 > x1:
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        k = (y1 - y0) / (x1 - x0)
+        xs = np.arange(x0, x1 + 1)
+        return _points(xs, np.trunc(y0 + k * (xs - x0)))
+    elif algorithm == 'DDA' or algorithm == 'Bresenham':
+        if x0 == x1:
+            ys = np.arange(min(y0, y1), max(y0, y1) + 1)
+            return _points(np.full(len(ys), x0), ys)
+        elif y0 == y1:
+            xs = np.arange(min(x0, x1), max(x0, x1) + 1)
+            return _points(xs, np.full(len(xs), y0))
+    if algorithm == 'DDA':
+        k = (y1 - y0) / (x1 - x0)
+        if abs(k) <= 1:
+            if x0 > x1:  # make sure x is adding
+                x0, y0, x1, y1 = x1, y1, x0, y0
+            xs = np.arange(x0, x1 + 1)
+            return _points(xs, _accumulate(y0, k, len(xs)))
+        else:
+            if y0 > y1:  # make sure y is adding
+                x0, y0, x1, y1 = x1, y1, x0, y0
+            ys = np.arange(y0, y1 + 1)
+            return _points(_accumulate(x0, 1 / k, len(ys)), ys)
+    elif algorithm == 'Bresenham':
+        dy, dx, ex = abs(y1 - y0), abs(x1 - x0), 0
+        if dy > dx:  # the |k| > 1, need exchange x, y
+            dx, dy = dy, dx
+            ex = 1
+            x0, y0, x1, y1 = y0, x0, y1, x1
+        if x0 > x1:  # make sure x is adding
+            x0, y0, x1, y1 = x1, y1, x0, y0
+        s = (1 if y0 < y1 else -1)
+        i = np.arange(dx + 1)
+        # 第i步之前y已经递增的次数为ceil((2 * dy * i - dx) / (2 * dx))，与逐步更新决策参数p的结果相同
+        steps = -((dx - 2 * dy * i) // (2 * dx))
+        if ex == 1:  # exchange x, y
+            return _points(y0 + s * steps, x0 + i)
+        return _points(x0 + i, y0 + s * steps)
+    return np.empty((0, 2), dtype=np.int64)
+
+
+def _expand(counts):
+    """按每段的像素数展开：返回每个像素所属的段号、其在段内的序号以及各段的起止下标"""
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    owner = np.repeat(np.arange(len(counts)), counts)
+    return owner, np.arange(offsets[-1]) - offsets[owner], offsets
+
+
+def _accumulate_segments(start, step, counts, offsets):
+    """对每段分别做DDA增量累加，结果按段依次拼接
+
+    每段都必须从自己的起点开始逐次相加才能与逐点计算的结果一致，因此把长度相近的段（按2的幂分组）
+    排成二维数组，沿行方向做一次累加
+    """
+    result = np.empty(offsets[-1], dtype=np.float64)
+    widths = np.left_shift(1, np.ceil(np.log2(np.maximum(counts, 1))).astype(np.int64))
+    for w in np.unique(widths):
+        sel = np.flatnonzero(widths == w)
+        seq = np.repeat(step[sel, None], w, axis=1)
+        seq[:, 0] = start[sel]
+        col = np.arange(w)
+        valid = col < counts[sel, None]
+        result[(offsets[sel, None] + col)[valid]] = np.add.accumulate(seq, axis=1)[valid]
+    return np.rint(result)
+
+
+def draw_lines(segments, algorithm):
+    """批量绘制线段，一次调用完成所有线段的计算，每条线段的结果与draw_line相同
+
+    :param segments: (array-like of int, shape (M, 4): [[x0, y0, x1, y1], ...]) 各线段的起点和终点坐标
+    :param algorithm: (string) 绘制使用的算法，包括'Naive'、'DDA'和'Bresenham'
+    :return: (tuple: (numpy.ndarray of int, shape (N, 2), numpy.ndarray of int, shape (M + 1,)))
+             所有线段的像素点坐标依次拼接而成的数组，以及各线段在其中的起止下标，第i条线段为pixels[offsets[i]:offsets[i + 1]]
+    """
+    x0, y0, x1, y1 = _as_int(segments).reshape(-1, 4).T
+    dx, dy = x1 - x0, y1 - y0
+    if algorithm == 'Naive':
+        vertical = dx == 0
+        swap = dx < 0  # make sure x is adding
+        sx, sy = np.where(swap, x1, x0), np.where(swap, y1, y0)
+        k = np.divide(dy, dx, out=np.zeros(len(dx)), where=~vertical)
+        owner, i, offsets = _expand(np.where(vertical, np.maximum(dy + 1, 0), np.abs(dx) + 1))
+        vertical = vertical[owner]
+        xs = np.where(vertical, x0[owner], sx[owner] + i)
+        ys = np.where(vertical, y0[owner] + i, np.trunc(sy[owner] + k[owner] * i))
+        return _points(xs, ys), offsets
+    if algorithm != 'DDA' and algorithm != 'Bresenham':
+        return np.empty((0, 2), dtype=np.int64), np.zeros(len(dx) + 1, dtype=np.int64)
+
+    # 沿变化较大的坐标轴（主轴）逐像素前进，另一坐标轴为副轴；水平、竖直线段和单点都是其特例
+    ex = np.abs(dy) > np.abs(dx)  # the |k| > 1, need exchange x, y
+    a0, b0, da, db = np.where(ex, y0, x0), np.where(ex, x0, y0), np.where(ex, dy, dx), np.where(ex, dx, dy)
+    swap = da < 0  # make sure the major axis is adding
+    a0, b0 = np.where(swap, a0 + da, a0), np.where(swap, b0 + db, b0)
+    da, db = np.abs(da), np.where(swap, -db, db)
+    owner, i, offsets = _expand(da + 1)
+    if algorithm == 'DDA':
+        k = np.divide(dy, dx, out=np.zeros(len(dx)), where=dx != 0)
+        step = np.divide(1, k, out=np.zeros(len(k)), where=ex & (k != 0))  # 与draw_line中的1 / k相同
+        step = np.where(ex, step, k)
+        major, minor = a0[owner] + i, _accumulate_segments(b0, step, da + 1, offsets)
+    else:
+        # 第i步之前副轴坐标已经变化的次数为ceil((2 * |db| * i - da) / (2 * da))
+        steps = -((da[owner] - 2 * np.abs(db)[owner] * i) // np.maximum(2 * da, 1)[owner])
+        major, minor = a0[owner] + i, b0[owner] + np.sign(db)[owner] * steps
+    ex = ex[owner]
+    return _points(np.where(ex, minor, major), np.where(ex, major, minor)), offsets
+
+
+def polygon_segments(p_list):
+    """多边形的各条边，顺序与draw_polygon相同（从最后一个顶点到第一个顶点的边开始）
+
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 多边形的顶点坐标列表
+    :return: (numpy.ndarray of int, shape (n, 4): [[x0, y0, x1, y1], ...]) 各条边的起点和终点坐标
+    """
+    p = _as_int(p_list).reshape(-1, 2)
+    return np.hstack([np.roll(p, 1, axis=0), p])
+
+
+def draw_polygon(p_list, algorithm):
+    """绘制多边形（所有边通过一次draw_lines调用完成）
+
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 多边形的顶点坐标列表
+    :param algorithm: (string) 绘制使用的算法，包括'DDA'和'Bresenham'
+    :return: (numpy.ndarray of int, shape (N, 2): [[x_0, y_0], [x_1, y_1], ...]) 绘制结果的像素点坐标数组
+    """
+    return draw_lines(polygon_segments(p_list), algorithm)[0]
+
+
+def draw_ellipse(p_list):
+    """绘制椭圆（采用中点圆生成算法），像素点与cg_algorithms.draw_ellipse相同，但坐标轴上的点只输出一次
+
+    第一象限的点记录在预先分配的数组中，其余三个象限按对称性直接写入结果数组
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1]]) 椭圆的矩形包围框左上角和右下角顶点坐标
+    :return: (numpy.ndarray of int, shape (N, 2): [[x_0, y_0], [x_1, y_1], ...]) 绘制结果的像素点坐标数组
+    """
+    x0, y0 = p_list[0]
+    x1, y1 = p_list[1]
+    a, b = int(abs(x1 - x0) / 2), int(abs(y0 - y1) / 2)
+    a2, b2 = a * a, b * b
+    xc, yc = int((x0 + x1) / 2), int((y0 + y1) / 2)  # vector need to be added
+    # 区域1中x每步加1，只需记下每个x对应的y；区域2中y每步减1，只需记下每个y对应的x
+    ys = np.empty(a + 1, dtype=np.int64)  # 区域1结束时x不超过a
+    x, y = 0, b
+    p_k = b2 - a2 * y + a2 / 4
+    ys[0] = y
+    while 2 * b2 * x < 2 * a2 * y:
+        if p_k < 0:
+            p_k = p_k + 2 * b2 * x + 3 * b2
+        else:
+            p_k = p_k + 2 * b2 * x - 2 * a2 * y + 2 * a2 + 3 * b2
+            y -= 1
+        x += 1
+        ys[x] = y
+    n, m = x + 1, y
+    xs = np.empty(m, dtype=np.int64)
+    p_k = b2 * pow((x + 1 / 2), 2) + a2 * pow((y - 1), 2) - a2 * b2
+    while y > 0:
+        if p_k > 0:
+            p_k = p_k - 2 * a2 * y + 3 * a2
+        else:
+            x += 1
+            p_k = p_k + 2 * b2 * x - 2 * a2 * y + 2 * b2 + 3 * a2
+        y -= 1
+        xs[m - 1 - y] = x
+
+    qx = np.concatenate([np.arange(n), xs])  # 第一象限
+    qy = np.concatenate([ys[:n], np.arange(m - 1, -1, -1)])
+    on_y, on_x = qx == 0, qy == 0  # 坐标轴上的点在对称象限中不再重复输出
+    masks = [None, ~on_y, ~(on_y | on_x), ~on_x]
+    signs = [(1, 1), (-1, 1), (-1, -1), (1, -1)]
+    result = np.empty((len(qx) + sum(int(k.sum()) for k in masks[1:]), 2), dtype=np.int64)
+    pos = 0
+    for (sx, sy), mask in zip(signs, masks):
+        px, py = (qx, qy) if mask is None else (qx[mask], qy[mask])
+        result[pos:pos + len(px), 0] = sx * px + xc
+        result[pos:pos + len(px), 1] = sy * py + yc
+        pos += len(px)
+    return result
+
+
+_bspline_basis_cache = {}  # 取样数 -> 基函数矩阵
+
+
+def bspline_basis(samples):
+    """三次均匀B样条的基函数矩阵，shape (samples, 4)，与cg_algorithms.bspline_basis相同，每种取样数只转换一次"""
+    if samples not in _bspline_basis_cache:
+        _bspline_basis_cache[samples] = np.array(alg.bspline_basis(samples))
+    return _bspline_basis_cache[samples]
+
+
+def draw_curve(p_list, algorithm, adaptive=False):
+    """绘制曲线，B样条的每段曲线通过基函数矩阵与控制点矩阵的一次乘法求出
+
+    :param p_list: (list of list of int: [[x0, y0], [x1, y1], [x2, y2], ...]) 曲线的控制点坐标列表
+    :param algorithm: (string) 绘制使用的算法，包括'Bezier'和'B-spline'（三次均匀B样条曲线，曲线不必经过首末控制点）
+    :param adaptive: (bool) 是否按曲线长度自适应地决定计算量，为False时每段曲线固定取1001个参数值
+    :return: (numpy.ndarray of int, shape (N, 2): [[x_0, y_0], [x_1, y_1], ...]) 绘制结果的像素点坐标数组
+    """
+    if algorithm != 'B-spline':
+        return np.asarray(alg.draw_curve(p_list, algorithm, adaptive), dtype=np.int64).reshape(-1, 2)
+    p = np.asarray(p_list, dtype=np.float64).reshape(-1, 2)
+    segments = [p[i:i + 4] for i in range(len(p) - 3)]
+    if not segments:
+        return np.empty((0, 2), dtype=np.int64)
+    samples = [alg.bspline_samples(q.tolist()) if adaptive else 1001 for q in segments]
+    res = [None] * len(segments)
+    for n in set(samples):  # 取样数相同的段一起计算
+        sel = [i for i, m in enumerate(samples) if m == n]
+        q = np.stack([segments[i] for i in sel])  # (m, 4, 2)
+        w = bspline_basis(n)
+        # 按j的顺序逐项累加，保证与逐点计算的浮点结果一致
+        points = w[None, :, 0, None] * q[:, None, 0]
+        for j in range(1, 4):
+            points = points + w[None, :, j, None] * q[:, None, j]
+        points = np.rint(points / 6).astype(np.int64)
+        for k, i in enumerate(sel):
+            res[i] = points[k]
+    return np.concatenate(res)
+
+
+def pack(p_lists):
+    """把多个图元的参数打包为一个点数组
+
+    :param p_lists: (list of list of list of int: [[[x0, y0], [x1, y1], ...], ...]) 各图元的参数
+    :return: (tuple: (numpy.ndarray, shape (N, 2), numpy.ndarray of int, shape (M + 1,)))
+             所有图元的点依次拼接而成的数组，以及各图元在其中的起止下标
+    """
+    counts = [len(p) for p in p_lists]
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    points = [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in p_lists]
+    return (np.concatenate(points) if points else np.empty((0, 2))), offsets
+
+
+def unpack(points, offsets):
+    """pack的逆操作，返回各图元的参数列表"""
+    points = points.tolist()
+    return [points[start:stop] for start, stop in zip(offsets[:-1], offsets[1:])]
+
+
+def translation(dx, dy):
+    """平移变换的3x3齐次矩阵
+    :param dx: (int) 水平方向平移量
+    :param dy: (int) 垂直方向平移量
+    """
+    return np.array([[1, 0, dx], [0, 1, dy], [0, 0, 1]], dtype=np.float64)
+
+
+def rotation(x, y, r):
+    """以(x, y)为中心旋转r度的3x3齐次矩阵，方向与cg_algorithms.rotate相同
+    :param x: (int) 旋转中心x坐标
+    :param y: (int) 旋转中心y坐标
+    :param r: (int) 顺时针旋转角度（°）
+    """
+    theta = math.radians(r)
+    cos, sin = math.cos(theta), math.sin(theta)
+    m = np.array([[cos, -sin, 0], [sin, cos, 0], [0, 0, 1]], dtype=np.float64)
+    return translation(x, y) @ m @ translation(-x, -y)
+
+
+def scaling(x, y, s):
+    """以(x, y)为中心缩放s倍的3x3齐次矩阵
+    :param x: (int) 缩放中心x坐标
+    :param y: (int) 缩放中心y坐标
+    :param s: (float) 缩放倍数
+    """
+    m = np.array([[s, 0, 0], [0, s, 0], [0, 0, 1]], dtype=np.float64)
+    return translation(x, y) @ m @ translation(-x, -y)
+
+
+def compose(*matrices):
+    """复合若干变换，得到依次施加matrices[0], matrices[1], ...的矩阵"""
+    result = np.eye(3)
+    for m in matrices:
+        result = m @ result
+    return result
+
+
+def transform(points, matrix, offsets=None, keep_float=False, center=None):
+    """对打包的点数组施加仿射变换，所有点在一次numpy运算中完成
+
+    :param points: (array-like, shape (N, 2)) 待变换的点，通常由pack得到
+    :param matrix: (numpy.ndarray, shape (3, 3) 或 (M, 3, 3)) 施加于所有点的变换矩阵，或每个图元各自的变换矩阵
+    :param offsets: (numpy.ndarray of int, shape (M + 1,)) 各图元在points中的起止下标，matrix为每个图元各一个矩阵时需要
+    :param keep_float: (bool) 为True时保留浮点坐标，留到draw_lines等绘制时再四舍五入，避免多次变换累积取整误差；否则立即四舍五入为整数
+    :param center: (array-like, shape (2,) 或 (M, 2)) matrix是以该点为中心的rotation或scaling时给出，
+                   此时只用矩阵的线性部分，按x + (p - x) * s的顺序相对中心计算，结果与cg_algorithms.rotate/scale逐点相同
+    :return: (numpy.ndarray, shape (N, 2)) 变换后的点
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    matrix = np.asarray(matrix, dtype=np.float64)
+    if matrix.ndim == 3:  # 每个点使用所属图元的矩阵
+        matrix = np.repeat(matrix, np.diff(offsets), axis=0)
+    if center is not None:
+        center = np.asarray(center, dtype=np.float64)
+        if center.ndim == 2:
+            center = np.repeat(center, np.diff(offsets), axis=0)
+        m = matrix[..., :2, :2]
+        d = points - center
+        # 与标量版本相同的运算顺序：x + dx * m00 + dy * m01
+        result = np.stack([center[..., 0] + d[:, 0] * m[..., 0, 0] + d[:, 1] * m[..., 0, 1],
+                           center[..., 1] + d[:, 0] * m[..., 1, 0] + d[:, 1] * m[..., 1, 1]], axis=1)
+    elif matrix.ndim == 3:
+        result = np.einsum('nij,nj->ni', matrix[:, :2, :2], points) + matrix[:, :2, 2]
+    else:
+        result = points @ matrix[:2, :2].T + matrix[:2, 2]
+    if keep_float:
+        return result
+    return np.rint(result).astype(np.int64)
+
+
+def _encode(x, y, x_min, y_min, x_max, y_max):
+    """Cohen-Sutherland区域编码，与cg_algorithms.clip中的encode相同"""
+    code = np.where(y > y_max, 8, np.where(y < y_min, 4, 0))
+    return code | np.where(x > x_max, 2, np.where(x < x_min, 1, 0))
+
+
+def clip_lines(segments, x_min, y_min, x_max, y_max, algorithm):
+    """用同一个裁剪窗口批量裁剪线段，每条线段的结果与cg_algorithms.clip相同
+
+    :param segments: (array-like of int, shape (M, 4): [[x0, y0, x1, y1], ...]) 各线段的起点和终点坐标
+    :param x_min: 裁剪窗口左上角x坐标
+    :param y_min: 裁剪窗口左上角y坐标
+    :param x_max: 裁剪窗口右下角x坐标
+    :param y_max: 裁剪窗口右下角y坐标
+    :param algorithm: (string) 使用的裁剪算法，包括'Cohen-Sutherland'和'Liang-Barsky'
+    :return: (tuple: (numpy.ndarray of int, shape (K, 4), numpy.ndarray of bool, shape (M,)))
+             保留下来的线段裁剪后的起点和终点坐标（按原顺序），以及标记被整条舍弃的线段的数组
+    """
+    seg = np.asarray(segments, dtype=np.float64).reshape(-1, 4)
+    x1, y1, x2, y2 = seg.T.copy()
+    if y_min > y_max:
+        y_max, y_min = y_min, y_max
+    discarded = np.zeros(len(seg), dtype=bool)
+
+    if algorithm == 'Cohen-Sutherland':
+        c1 = _encode(x1, y1, x_min, y_min, x_max, y_max)
+        c2 = _encode(x2, y2, x_min, y_min, x_max, y_max)
+        active = (c1 != 0) | (c2 != 0)
+        while active.any():  # 不断裁剪直到全部保留或舍弃
+            discarded |= active & (c1 & c2 != 0)
+            active &= (c1 & c2 == 0) & ((c1 != 0) | (c2 != 0))
+            swap = active & (c1 == 0)  # 找到边界外的那个点
+            x1, x2 = np.where(swap, x2, x1), np.where(swap, x1, x2)
+            y1, y2 = np.where(swap, y2, y1), np.where(swap, y1, y2)
+            c1, c2 = np.where(swap, c2, c1), np.where(swap, c1, c2)
+            top = active & (c1 & 8 == 8)
+            bottom = active & ~top & (c1 & 4 == 4)
+            right = active & ~top & ~bottom & (c1 & 2 == 2)
+            left = active & ~top & ~bottom & ~right & (c1 & 1 == 1)
+            for sel, y_edge in ((top, y_max), (bottom, y_min)):  # 上、下边界外
+                x1[sel] = x1[sel] + (y_edge - y1[sel]) * (x2[sel] - x1[sel]) / (y2[sel] - y1[sel])
+                y1[sel] = y_edge
+            for sel, x_edge in ((right, x_max), (left, x_min)):  # 右、左边界外
+                y1[sel] = y1[sel] + (y2[sel] - y1[sel]) * (x_edge - x1[sel]) / (x2[sel] - x1[sel])
+                x1[sel] = x_edge
+            c1 = _encode(x1, y1, x_min, y_min, x_max, y_max)  # 更新c1和c2的编码
+            c2 = _encode(x2, y2, x_min, y_min, x_max, y_max)
+        result = np.stack([x1, y1, x2, y2], axis=1)
+    elif algorithm == 'Liang-Barsky':
+        dx, dy = x2 - x1, y2 - y1
+        p = np.stack([-dx, dx, -dy, dy])
+        q = np.stack([x1 - x_min, x_max - x1, y1 - y_min, y_max - y1])
+        discarded |= ((p == 0) & (q < 0)).any(axis=0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            r = q / p
+        u1 = np.where(p < 0, r, 0).max(axis=0)  # 入边
+        u2 = np.where(p > 0, r, 1).min(axis=0)  # 出边
+        discarded |= u1 > u2
+        result = np.stack([x1 + u1 * dx, y1 + u1 * dy, x1 + u2 * dx, y1 + u2 * dy], axis=1)
+    else:
+        return np.empty((0, 4), dtype=np.int64), np.ones(len(seg), dtype=bool)
+    return np.rint(result[~discarded]).astype(np.int64), discarded
+
+
+def clip_polygons(points, offsets, clip_list):
+    """Sutherland-Hodgman算法批量裁剪多边形，所有多边形的顶点在每条裁剪边处一起处理
+
+    :param points: (array-like, shape (N, 2)) 所有被裁剪多边形的顶点依次拼接而成的数组，通常由pack得到
+    :param offsets: (numpy.ndarray of int, shape (M + 1,)) 各多边形在points中的起止下标
+    :param clip_list: (list of list of int: [[x0, y0], [x1, y1], ...]) 裁剪窗口（凸多边形）的顶点坐标
+    :return: (tuple: (numpy.ndarray of int, shape (K, 2), numpy.ndarray of int, shape (M + 1,)))
+             裁剪后各多边形的顶点及其起止下标，被整个裁掉的多边形顶点数为0
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    for i in range(len(clip_list)):
+        (x0, y0), (x1, y1) = clip_list[i - 1], clip_list[i]
+        counts = np.diff(offsets)
+        # 每个顶点e与它在多边形中的前一个顶点s组成一条边，第一个顶点的前一个顶点是最后一个顶点
+        prev = np.arange(len(points)) - 1
+        nonempty = counts > 0
+        prev[offsets[:-1][nonempty]] = offsets[1:][nonempty] - 1
+        d = (x1 - x0) * (points[:, 1] - y0) - (y1 - y0) * (points[:, 0] - x0)  # <= 0表示在窗口内侧
+        ds, s = d[prev], points[prev]
+        e_in, s_in = d <= 0, ds <= 0
+        cross = e_in != s_in  # 边与裁剪边相交，先输出交点
+        t = np.divide(ds, ds - d, out=np.zeros(len(d)), where=cross)
+        n = cross.astype(np.int64) + e_in  # 每条边输出的顶点数
+        pos = np.cumsum(n) - n
+        result = np.empty((pos[-1] + n[-1] if len(n) else 0, 2))
+        result[pos[cross]] = s[cross] + t[cross, None] * (points[cross] - s[cross])
+        result[(pos + cross)[e_in]] = points[e_in]  # 再输出在内侧的终点
+        owner = np.repeat(np.arange(len(counts)), counts)
+        new_offsets = np.zeros_like(offsets)
+        np.cumsum(np.bincount(owner, weights=n, minlength=len(counts)).astype(np.int64), out=new_offsets[1:])
+        points, offsets = result, new_offsets
+    return np.rint(points).astype(np.int64), offsets
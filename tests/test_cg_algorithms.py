@@ -0,0 +1,100 @@
+import math
+import random
+
+import pytest
+
+import cg_algorithms as alg
+
+CASES = [('line', 'DDA', 2), ('line', 'Bresenham', 2), ('line', 'Naive', 2),
+         ('polygon', 'DDA', 5), ('polygon', 'Bresenham', 5), ('fill_polygon', None, 6),
+         ('ellipse', None, 2), ('curve', 'Bezier', 4), ('curve', 'B-spline', 6)]
+
+
+@pytest.mark.parametrize('adaptive', [False, True])
+@pytest.mark.parametrize('item_type, algorithm, count', CASES)
+def test_raster_cache_matches_direct(item_type, algorithm, count, adaptive):
+    rng = random.Random(12)
+    cache = alg.RasterCache(adaptive=adaptive)
+    direct = alg.RasterCache(translate=False, adaptive=adaptive)
+    for _ in range(100):
+        p_list = [[rng.randint(0, 300), rng.randint(0, 300)] for _ in range(count)]
+        if item_type == 'line' and algorithm == 'Naive':
+            p_list.sort()
+        for dx, dy in [(0, 0), (rng.randint(0, 200), rng.randint(0, 200)), (rng.randint(-400, 0), -7)]:
+            moved = alg.translate(p_list, dx, dy)
+            assert cache.draw(item_type, moved, algorithm) == direct.rasterize(item_type, moved, algorithm)
+
+
+@pytest.mark.parametrize('p_list', [[[-41, 0], [-21, 40], [-61, 40]],
+                                    [[-50, -32], [-2, -16], [-18, 16], [-66, 0]],
+                                    [[-10, 0], [30, 20], [-30, 40]]])
+def test_fill_spans_negative_x_matches_translated(p_list):
+    shifted = alg.fill_spans(alg.translate(p_list, 128, 0))
+    assert alg.fill_spans(p_list) == [(y, x0 - 128, x1 - 128) for y, x0, x1 in shifted]
+
+
+def test_steep_dda_matches_vectorized():
+    import cg_vectorized as vec
+
+    rng = random.Random(5)
+    for _ in range(500):
+        p_list = [[rng.randint(-300, 300), rng.randint(-300, 300)] for _ in range(2)]
+        result = alg.draw_line(p_list, 'DDA')
+        assert all(type(v) is int for point in result for v in point)
+        assert result == vec.draw_line(p_list, 'DDA').tolist()
+
+
+def test_fill_spans_stay_within_polygon():
+    rng = random.Random(3)
+    for _ in range(2000):
+        p_list = [[rng.randint(0, 300), rng.randint(0, 300)] for _ in range(rng.randint(3, 7))]
+        p_list[0][0] = 0
+        x_max = max(x for x, y in p_list)
+        assert all(0 <= x0 and x1 <= x_max for y, x0, x1 in alg.fill_spans(p_list))
+
+
+def baseline_clip_polygon(p_list, clip_list):
+    """原来逐条裁剪边复制整个多边形、按直线方程求交点的实现，作为对照"""
+    def is_inside(p1, p2, q):
+        return (p2[0] - p1[0]) * (q[1] - p1[1]) - (p2[1] - p1[1]) * (q[0] - p1[0]) <= 0
+
+    def compute_intersection(p1, p2, p3, p4):
+        if p2[0] - p1[0] == 0:
+            m2 = (p4[1] - p3[1]) / (p4[0] - p3[0])
+            return [p1[0], m2 * p1[0] + p3[1] - m2 * p3[0]]
+        m1 = (p2[1] - p1[1]) / (p2[0] - p1[0])
+        b1 = p1[1] - m1 * p1[0]
+        if p4[0] - p3[0] == 0:
+            return [p3[0], m1 * p3[0] + b1]
+        m2 = (p4[1] - p3[1]) / (p4[0] - p3[0])
+        x = (p3[1] - m2 * p3[0] - b1) / (m1 - m2)
+        return [x, m1 * x + b1]
+
+    result = p_list
+    for i in range(len(clip_list)):
+        c0, c1 = clip_list[i - 1], clip_list[i]
+        polygon, result = result, []
+        for j in range(len(polygon)):
+            s, e = polygon[j - 1], polygon[j]
+            if is_inside(c0, c1, e):
+                if not is_inside(c0, c1, s):
+                    result.append(compute_intersection(s, e, c0, c1))
+                result.append(e)
+            elif is_inside(c0, c1, s):
+                result.append(compute_intersection(s, e, c0, c1))
+    return [[round(p[0]), round(p[1])] for p in result]
+
+
+def regular_polygon(n, radius, phase=0.0):
+    return [[round(radius * math.cos(phase - 2 * math.pi * i / n)), round(radius * math.sin(phase - 2 * math.pi * i / n))]
+            for i in range(n)]
+
+
+@pytest.mark.parametrize('n', [600, 2000])
+def test_clip_polygon_many_edges_matches_baseline(n):
+    rng = random.Random(n)
+    window = regular_polygon(n, 10 ** 6)
+    star = [[round(r * math.cos(-2 * math.pi * i / n)), round(r * math.sin(-2 * math.pi * i / n))]
+            for i, r in enumerate(rng.uniform(5e5, 1.5e6) for _ in range(n))]
+    for p_list in (regular_polygon(n, 1.1e6, 0.001), star):
+        assert alg.clip_polygon(p_list, window) == baseline_clip_polygon(p_list, window)
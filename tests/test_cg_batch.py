@@ -0,0 +1,18 @@
+import os
+
+import cg_batch
+import cg_scene
+
+
+def test_directory_sources_include_binary_scenes(tmp_path):
+    (tmp_path / 'a.txt').write_text('resetCanvas 100 100\ndrawLine l 10 10 90 40 DDA\nsaveCanvas a\n')
+    (tmp_path / 'notes.md').write_text('not an instruction file\n')
+    cg_scene.convert(str(tmp_path / 'a.txt'), str(tmp_path / 'b.cgs'))
+    output_root = str(tmp_path / 'out')
+    tasks = cg_batch.collect_tasks([str(tmp_path)], output_root)
+    assert tasks == [(str(tmp_path / 'a.txt'), os.path.join(output_root, 'a')),
+                     (str(tmp_path / 'b.cgs'), os.path.join(output_root, 'b'))]
+    for task in tasks:
+        assert cg_batch.render_file(task)['ok']
+    with open(os.path.join(output_root, 'a', 'a.bmp'), 'rb') as a, open(os.path.join(output_root, 'b', 'a.bmp'), 'rb') as b:
+        assert a.read() == b.read()
@@ -0,0 +1,216 @@
+import os
+import random
+
+import numpy as np
+import pytest
+
+import cg_algorithms as alg
+import cg_cli
+
+FAILING_MIDDLE = '''resetCanvas 100 100
+drawLine a 10 10 90 90 Bresenham
+saveCanvas one
+saveCanvas shared
+resetCanvas 100 100
+drawLine b 10 90 90 10 DDA
+saveCanvas two
+translate missing 1 1
+saveCanvas never
+resetCanvas 100 100
+drawEllipse c 20 20 80 60
+saveCanvas three
+saveCanvas shared
+'''.splitlines()
+
+
+def read_outputs(output_dir):
+    outputs = {}
+    for name in os.listdir(output_dir):
+        assert not name.startswith('.segment')
+        with open(os.path.join(output_dir, name), 'rb') as fp:
+            outputs[name] = fp.read()
+    return outputs
+
+
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_failing_middle_segment_matches_serial(tmp_path, jobs):
+    ops = cg_cli.compile_instructions(FAILING_MIDDLE)
+    serial = tmp_path / 'serial'
+    serial.mkdir()
+    with pytest.raises(cg_cli.InstructionError):
+        cg_cli.Interpreter(str(serial)).execute(ops)
+    parallel = tmp_path / 'parallel'
+    parallel.mkdir()
+    with pytest.raises(cg_cli.InstructionError):
+        cg_cli.run_parallel(ops, str(parallel), jobs)
+    expected = read_outputs(serial)
+    assert sorted(expected) == ['one.bmp', 'shared.bmp', 'two.bmp']
+    assert read_outputs(parallel) == expected
+
+
+def test_malformed_line_fails_when_reached(tmp_path):
+    ops = cg_cli.compile_instructions(['resetCanvas 100 100', 'saveCanvas before', 'drawLine a 1 x 5 5 DDA',
+                                       'saveCanvas after'])
+    assert ops[2] == ('invalid', ('drawLine a 1 x 5 5 DDA',))
+    with pytest.raises(cg_cli.InstructionError):
+        cg_cli.run_parallel(ops, str(tmp_path), 1)
+    assert sorted(os.listdir(tmp_path)) == ['before.bmp']
+
+
+EMPTY_RASTERS = '''resetCanvas 300 200
+drawCurve c 10 10 20 20 30 30 B-spline
+saveCanvas short_curve
+drawLine a 10 10 90 90 DDA
+clip a 150 150 200 180 Cohen-Sutherland
+saveCanvas clipped
+translate c 5 5
+saveCanvas moved
+'''.splitlines()
+
+
+def test_tiled_canvas_with_empty_rasters_matches_numpy(tmp_path):
+    ops = cg_cli.compile_instructions(EMPTY_RASTERS)
+    outputs = []
+    for name, tiled_pixels in (('plain', cg_cli.TILED_PIXELS), ('tiled', 100)):
+        output_dir = tmp_path / name
+        output_dir.mkdir()
+        interpreter = cg_cli.Interpreter(str(output_dir), tiled_pixels=tiled_pixels, tile_size=64, tile_dir=str(tmp_path))
+        interpreter.execute(ops)
+        assert isinstance(interpreter.canvas, cg_cli.TiledCanvas) == (name == 'tiled')
+        outputs.append(read_outputs(output_dir))
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize('tiled_pixels', [cg_cli.TILED_PIXELS, 100])
+def test_pixels_outside_canvas_are_dropped(tmp_path, tiled_pixels):
+    ops = cg_cli.compile_instructions([
+        'resetCanvas 300 200', 'saveCanvas blank', 'drawEllipse e 400 20 460 60',
+        'drawPolygon p 10 250 50 260 30 290 Bresenham', 'saveCanvas outside', 'translate e 10 0', 'saveCanvas moved',
+        'drawLine l 250 100 350 100 DDA', 'saveCanvas partly', 'resetCanvas 300 200', 'drawLine l 250 100 299 100 DDA',
+        'saveCanvas inside'])
+    cg_cli.Interpreter(str(tmp_path), tiled_pixels=tiled_pixels, tile_size=64).execute(ops)
+    outputs = read_outputs(tmp_path)
+    assert outputs['outside.bmp'] == outputs['moved.bmp'] == outputs['blank.bmp']
+    assert outputs['partly.bmp'] == outputs['inside.bmp']
+
+
+def test_profiler_item_counts_instructions(tmp_path):
+    ops = cg_cli.compile_instructions(['resetCanvas 100 100', 'drawEllipse e 10 10 50 40',
+                                       'drawLine a 0 0 90 90 DDA', 'saveCanvas one', 'translate a 1 1'])
+    profiler = cg_cli.Profiler()
+    cg_cli.Interpreter(str(tmp_path), profiler=profiler).execute(ops)
+    assert {key: count for key, (count, seconds) in profiler.stats['item'].items()} == {'e': 1, 'a': 2}
+    assert set(profiler.stats['algorithm']) == {'ellipse', 'line/polygon:DDA'}
+    assert 'item (ops on the item id)' in profiler.summary()
+
+
+def canvas_array(canvas):
+    return np.concatenate([np.array(strip) for strip in cg_cli.canvas_strips(canvas)])
+
+
+def random_item(rng, item_id):
+    """随机图元的绘制操作，坐标在300x300画布中部"""
+    def points(count):
+        return [[rng.randint(80, 220), rng.randint(80, 220)] for _ in range(count)]
+
+    kind = rng.choice(['line', 'polygon', 'fill_polygon', 'ellipse', 'curve'])
+    if kind == 'line':
+        return 'draw_line', (item_id, points(2), rng.choice(['DDA', 'Bresenham']))
+    elif kind == 'polygon':
+        return 'draw_polygon', (item_id, points(rng.randint(3, 6)), rng.choice(['DDA', 'Bresenham']))
+    elif kind == 'fill_polygon':
+        return 'fill_polygon', (item_id, points(rng.randint(3, 6)))
+    elif kind == 'ellipse':
+        return 'draw_ellipse', (item_id, points(2))
+    return 'draw_curve', (item_id, points(rng.randint(3, 6)), rng.choice(['Bezier', 'B-spline']))
+
+
+def random_edit(rng, interpreter, next_id):
+    """随机的编辑操作：平移、旋转、缩放、把线段裁剪掉一部分或全部、重新定义已有编号、新增图元；变换后越出画布的操作被跳过"""
+    items = interpreter.item_dict
+    item_id = rng.choice(list(items))
+    item_type, p_list = items[item_id][0], items[item_id][1]
+    choice = rng.choice(['translate', 'rotate', 'scale', 'clip', 'redraw', 'add'])
+    if choice == 'translate':
+        dx, dy = rng.randint(-30, 30), rng.randint(-30, 30)
+        op, moved = ('translate', (item_id, dx, dy)), alg.translate(p_list, dx, dy)
+    elif choice == 'rotate' and item_type != 'ellipse':
+        x, y, r = rng.randint(120, 180), rng.randint(120, 180), rng.choice([15, 30, 90, 135])
+        op, moved = ('rotate', (item_id, x, y, r)), alg.rotate(p_list, x, y, r)
+    elif choice == 'scale':
+        x, y, s = rng.randint(120, 180), rng.randint(120, 180), rng.choice([0.5, 0.8, 1.25])
+        op, moved = ('scale', (item_id, x, y, s)), alg.scale(p_list, x, y, s)
+    elif choice == 'clip' and item_type == 'line':  # 窗口可能与线段不相交，线段被整条删去
+        x, y = rng.randint(60, 200), rng.randint(60, 200)
+        return 'clip', (item_id, x, y, x + rng.randint(10, 80), y + rng.randint(10, 80),
+                        rng.choice(['Cohen-Sutherland', 'Liang-Barsky']))
+    elif choice == 'redraw':
+        return random_item(rng, item_id)
+    else:
+        return random_item(rng, next_id)
+    if all(0 <= v < 300 for point in moved for v in point):
+        return op
+    return None
+
+
+@pytest.mark.parametrize('tiled_pixels', [cg_cli.TILED_PIXELS, 100])
+@pytest.mark.parametrize('seed', range(4))
+def test_incremental_repaint_matches_full_render(tmp_path, seed, tiled_pixels):
+    rng = random.Random(seed)
+    writer = cg_cli.ImageWriter(max_workers=0)
+    interpreter = cg_cli.Interpreter(str(tmp_path), writer=writer, tiled_pixels=tiled_pixels, tile_size=64)
+    ops = [('reset_canvas', (300, 300))]
+    for i in range(6):
+        ops += [('set_color', (rng.randrange(256), rng.randrange(256), rng.randrange(256))), random_item(rng, f'i{i}')]
+    interpreter.run_ops(ops + [('save_canvas', ('step',))])
+    for step in range(40):
+        op = random_edit(rng, interpreter, f'i{step + 6}')
+        if op is None:
+            continue
+        interpreter.run_ops([('set_color', (rng.randrange(256), rng.randrange(256), rng.randrange(256))), op,
+                             ('save_canvas', ('step',))])
+        full = cg_cli.Interpreter(str(tmp_path), writer=writer, tiled_pixels=tiled_pixels, tile_size=64)
+        full.run_ops(interpreter.state_ops())
+        full.repaint_dirty()
+        assert (canvas_array(interpreter.canvas) == canvas_array(full.canvas)).all(), (step, op)
+    writer.wait()
+
+
+RESUMABLE = '''resetCanvas 200 200
+setColor 255 0 0
+drawLine a 10 10 190 150 DDA
+saveCanvas one
+drawEllipse e 30 30 120 90
+setColor 0 0 255
+fillPolygon f 100 20 180 60 120 180
+saveCanvas two
+translate a 5 5
+rotate f 140 100 45
+saveCanvas three
+resetCanvas 150 150
+drawCurve c 10 140 40 10 110 140 140 10 B-spline
+saveCanvas four
+'''
+
+
+@pytest.mark.parametrize('resume_from', [6, 9, 13])
+def test_resumed_run_matches_full_run(tmp_path, resume_from):
+    script = tmp_path / 'script.txt'
+    script.write_text(RESUMABLE)
+    full, resumed, snaps = tmp_path / 'full', tmp_path / 'resumed', tmp_path / 'snaps'
+    cg_cli.main(['cg_cli.py', str(script), str(full), '--snapshot-dir', str(snaps), '--snapshot-every', '3'])
+    cg_cli.main(['cg_cli.py', str(script), str(resumed), '--snapshot-dir', str(snaps), '--resume-from', str(resume_from),
+                 '-j', '1'])
+    lines = RESUMABLE.splitlines()
+    expected = {lines[i].split()[1] + '.bmp' for i in range(resume_from - 1, len(lines)) if lines[i].startswith('saveCanvas')}
+    outputs = read_outputs(resumed)
+    assert set(outputs) == expected
+    assert all(read_outputs(full)[name] == data for name, data in outputs.items())
+
+
+def test_resume_requires_snapshot_dir(tmp_path):
+    script = tmp_path / 'script.txt'
+    script.write_text(RESUMABLE)
+    with pytest.raises(SystemExit):
+        cg_cli.main(['cg_cli.py', str(script), str(tmp_path / 'out'), '--resume-from', '5'])
+    assert not (tmp_path / 'out').exists()
@@ -0,0 +1,69 @@
+import os
+
+import pytest
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+QtWidgets = pytest.importorskip('PyQt5.QtWidgets')
+
+from PyQt5.QtCore import Qt  # noqa: E402
+from PyQt5.QtGui import QColor, QImage, QPainter, QPen  # noqa: E402
+
+import cg_gui  # noqa: E402
+
+app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+# 坐标取在100到800之间：Qt画宽点时在16、32到61、1024附近的坐标上会多出一列，与本测试无关
+ITEMS = [('line', [[120, 130], [650, 700]], 'DDA'), ('line', [[700, 120], [640, 760]], 'Bresenham'),
+         ('polygon', [[120, 120], [700, 160], [400, 720]], 'DDA'),
+         ('polygon', [[300, 150], [650, 500], [200, 700], [150, 300]], 'Bresenham'),
+         ('fill_polygon', [[150, 140], [690, 200], [420, 700]], ''), ('ellipse', [[130, 200], [690, 560]], ''),
+         ('curve', [[120, 700], [250, 120], [550, 720], [700, 130]], 'Bezier'),
+         ('curve', [[120, 700], [250, 120], [550, 720], [700, 130], [760, 600]], 'B-spline')]
+
+
+def blank():
+    image = QImage(900, 900, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.white)
+    return image
+
+
+def paint_per_pixel(image, item_type, pixels, color, width):
+    """逐个像素设置画笔并画点，填充结果的各区段展开为像素
+    不用宽画笔画区段：Qt描边宽线段时两端半像素处的取舍受浮点误差影响，偶尔多出一列
+    """
+    if item_type == 'fill_polygon':
+        pixels = [(x, y) for y, x0, x1 in pixels for x in range(x0, x1 + 1)]
+    painter = QPainter(image)
+    for x, y in pixels:
+        painter.setPen(QPen(color, width))
+        painter.drawPoint(x, y)
+    painter.end()
+
+
+@pytest.mark.parametrize('width', [1, 3, 5])
+@pytest.mark.parametrize('item_type, p_list, algorithm', ITEMS)
+def test_paint_raster_matches_per_pixel_painting(item_type, p_list, algorithm, width):
+    color = QColor(10, 120, 200)
+    pixels = cg_gui.raster_cache.draw(item_type, p_list, algorithm)
+    expected = blank()
+    paint_per_pixel(expected, item_type, pixels, color, width)
+    batched = blank()
+    painter = QPainter(batched)
+    cg_gui.paint_raster(painter, item_type, pixels, color, width)
+    painter.end()
+    assert batched == expected
+
+
+@pytest.mark.parametrize('width', [1, 3, 5])
+@pytest.mark.parametrize('item_type, p_list, algorithm', ITEMS)
+def test_cached_image_matches_direct_painting(item_type, p_list, algorithm, width):
+    color = QColor(200, 40, 90)
+    item = cg_gui.MyItem('x', item_type, p_list, algorithm, color, width)
+    expected = blank()
+    paint_per_pixel(expected, item_type, cg_gui.raster_cache.draw(item_type, p_list, algorithm), color, width)
+    cached = blank()
+    painter = QPainter(cached)
+    painter.drawImage(*item.render_image())
+    painter.end()
+    assert cached == expected
+    assert item.render_image() is item.render_image()  # 参数未变时使用缓存
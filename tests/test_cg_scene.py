@@ -0,0 +1,46 @@
+import os
+
+import pytest
+
+import cg_cli
+import cg_scene
+
+SCRIPT = '''resetCanvas 200 150
+setColor 255 0 0
+drawLine a 10 10 190 140 DDA
+drawPolygon p 20 20 80 30 60 90 Bresenham
+saveCanvas first
+setColor 0 128 255
+fillPolygon f 100 20 180 40 140 120
+drawEllipse e 30 90 110 140
+drawCurve c 10 140 60 10 120 140 190 10 Bezier
+drawCurve b 10 10 60 140 120 10 190 140 B-spline
+translate a 5 -3
+rotate p 50 50 30
+scale f 140 60 0.5
+clip a 20 20 120 100 Liang-Barsky
+saveCanvas second
+'''
+
+
+def test_round_trip_matches_text(tmp_path):
+    text = tmp_path / 'scene.txt'
+    text.write_text(SCRIPT)
+    scene = tmp_path / 'scene.cgs'
+    cg_scene.convert(str(text), str(scene))
+    assert cg_scene.is_scene(str(scene)) and not cg_scene.is_scene(str(text))
+    assert cg_scene.load(str(scene)) == cg_cli.compile_instructions(SCRIPT.splitlines())
+    outputs = []
+    for name, path in (('text', text), ('binary', scene)):
+        output_dir = tmp_path / name
+        output_dir.mkdir()
+        cg_cli.Interpreter(str(output_dir)).run_file(str(path))
+        outputs.append({f: (output_dir / f).read_bytes() for f in sorted(os.listdir(output_dir))})
+    assert sorted(outputs[0]) == ['first.bmp', 'second.bmp']
+    assert outputs[0] == outputs[1]
+
+
+@pytest.mark.parametrize('value', [2 ** 31, -2 ** 31 - 1])
+def test_encode_rejects_values_outside_int32(value):
+    with pytest.raises(ValueError, match=str(value)):
+        cg_scene.encode([('draw_line', ('a', [[0, 0], [value, 5]], 'DDA'))])
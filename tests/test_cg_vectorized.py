@@ -0,0 +1,28 @@
+import random
+
+import numpy as np
+
+import cg_algorithms as alg
+import cg_vectorized as vec
+
+
+def test_transform_about_center_matches_scalar():
+    rng = random.Random(8)
+    p_lists, matrices, centers, expected = [], [], [], []
+    for _ in range(2000):
+        p_list = [[rng.randint(-500, 500), rng.randint(-500, 500)] for _ in range(rng.randint(1, 6))]
+        x, y = rng.randint(-300, 300), rng.randint(-300, 300)
+        if rng.random() < 0.5:
+            s = rng.choice([0.5, 1.5, 2.0, rng.uniform(0, 3)])
+            matrix, result = vec.scaling(x, y, s), alg.scale(p_list, x, y, s)
+        else:
+            r = rng.randint(0, 359)
+            matrix, result = vec.rotation(x, y, r), alg.rotate(p_list, x, y, r)
+        assert vec.transform(p_list, matrix, center=(x, y)).tolist() == result
+        p_lists.append(p_list)
+        matrices.append(matrix)
+        centers.append((x, y))
+        expected.append(result)
+    points, offsets = vec.pack(p_lists)
+    moved = vec.transform(points, np.stack(matrices), offsets, center=centers)
+    assert vec.unpack(moved, offsets) == expected